@@ -1,12 +1,9 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import sqlite3
-import os
-from cryptography.fernet import Fernet
-import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
+import startup_profiler
+import charts
+from scoring_client import stored_or_predicted_risk
+from pricing import calculate_realistic_premium
+from data_access import SPEED_BIN_MPH, load_drivers, load_driver_scores, load_driver_trips, load_driver_telemetry, decrypt_coordinates, load_driver_daily_harsh_events, load_driver_speed_histogram
 
 def show_dashboard():
     st.set_page_config(
@@ -15,69 +12,15 @@ def show_dashboard():
         layout="wide",
         initial_sidebar_state="expanded"
     )
-    DB_FILE = "telematics.db"
-    KEY_FILE = "secret.key"
-    MODEL_PATH = "stacking_model.pkl"
-
-
-    model = joblib.load(MODEL_PATH)
-
-
-    def calculate_realistic_premium(risk_score, base_premium=2285, max_risk_score=100):
-        normalized_risk = np.clip(risk_score / max_risk_score, 0, 1)
-        scaling_factor = 1 + 0.5 * normalized_risk
-        premium_annual = base_premium * scaling_factor
-        premium_monthly = premium_annual / 12
-        return premium_annual, premium_monthly
-
 
     def predict_risk_and_premium(df):
-        features = df.drop(columns=['driver_id'])
-        predicted_risk = model.predict(features)
-        premium_list = [calculate_realistic_premium(r) for r in predicted_risk]
+        predicted_risk = stored_or_predicted_risk(df, load_driver_scores())
         df['predicted_risk_score'] = predicted_risk
-        df['premium_annual'] = [p[0] for p in premium_list]
-        df['premium_monthly'] = [p[1] for p in premium_list]
+        df['premium_annual'], df['premium_monthly'] = calculate_realistic_premium(predicted_risk)
         return df
 
 
-    def get_connection():
-        db_path = os.path.join(os.path.dirname(__file__), DB_FILE)
-        return sqlite3.connect(db_path)
-
-
-    def load_key():
-        key_path = os.path.join(os.path.dirname(__file__), KEY_FILE)
-        with open(key_path, "rb") as f:
-            return f.read()
-
-
-    def decrypt_column(series, fernet):
-        decrypted = []
-        for val in series:
-            try:
-                decrypted_val = fernet.decrypt(val.encode()).decode()
-                decrypted.append(float(decrypted_val))
-            except:
-                decrypted.append(None)
-        return decrypted
-
-
-    @st.cache_data
-    def load_data():
-        with get_connection() as conn:
-            drivers = pd.read_sql("SELECT * FROM drivers", conn)
-            trips = pd.read_sql("SELECT * FROM trips", conn)
-            telemetry = pd.read_sql("SELECT * FROM telemetry_secure", conn)
-        key = load_key()
-        fernet = Fernet(key)
-        telemetry["lat"] = decrypt_column(telemetry["lat"], fernet)
-        telemetry["lon"] = decrypt_column(telemetry["lon"], fernet)
-        return drivers, trips, telemetry
-
-
-    drivers_df, trips_df, telemetry_df = load_data()
-    drivers_df = drivers_df.fillna(0)
+    drivers_df = load_drivers().fillna(0)
 
 
     drivers_risk_df = predict_risk_and_premium(drivers_df.copy())
@@ -91,8 +34,7 @@ def show_dashboard():
 
 
     driver_info = drivers_risk_df[drivers_risk_df["driver_id"] == selected_driver].iloc[0]
-    driver_trips = trips_df[trips_df["driver_id"] == selected_driver]
-    driver_telemetry = telemetry_df[telemetry_df["driver_id"] == selected_driver]
+    driver_trips = load_driver_trips(selected_driver)
 
 
     st.markdown("""
@@ -170,6 +112,8 @@ def show_dashboard():
         "Harsh Accelerating Events Over Time",
         "Speed Distribution",
         "Trip Duration Distribution",
+        "Trip Speed Profile",
+        "Trip Route",
     ]
 
 
@@ -178,66 +122,83 @@ def show_dashboard():
 
     if selected_graph == "Night Driving Fraction":
         night_pct = driver_info.get('night_trip_pct_overall', 0)
-        fig, ax = plt.subplots(figsize=(6, 0.1))
-        ax.barh([1], [1], height=0.4, color="#d0d0d0")
-        ax.barh([1], [night_pct], height=0.4, color="#7a6de8")
-        ax.set_xlim(0, 1)
-        ax.axis('off') 
-        st.pyplot(fig)
+        st.progress(float(min(max(night_pct, 0), 1)))
         st.markdown(f"<div style='text-align: center; font-size: 18px; color: #ff4dc2; margin-top: -12px;'>Night Driving: {safe_round(night_pct * 100)}%</div>", unsafe_allow_html=True)
 
     elif selected_graph == "Harsh Braking Events Over Time":
-        if not driver_telemetry.empty and "timestamp" in driver_telemetry.columns:
-            df = driver_telemetry.copy()
-            df['harsh_brake'] = df['acceleration'] < -4
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            timeline = df.set_index('timestamp').resample('D')['harsh_brake'].sum()
-
-            fig, ax = plt.subplots(figsize=(10, 4))
-            timeline.plot(ax=ax, color="#17DAE8", linestyle='-', marker='o')
-            ax.set_title("Harsh Braking Events Over Time", fontsize=14, color="#3f65b6")
-            ax.set_ylabel("Count", fontsize=12)
-            ax.grid(alpha=0.3)
-            st.pyplot(fig)
+        daily_events = load_driver_daily_harsh_events(selected_driver)
+        if not daily_events.empty:
+            timeline = daily_events['harsh_brakes']
+            st.image(charts.line_png(
+                selected_driver, "harsh_brakes_daily", charts.data_version(daily_events.reset_index()),
+                timeline.index, timeline.to_numpy(), color="#17DAE8",
+                title="Harsh Braking Events Over Time", ylabel="Count", title_color="#3f65b6",
+            ))
         else:
             st.info("No telemetry data available for harsh braking over time.")
 
     elif selected_graph == "Harsh Accelerating Events Over Time":
-        if not driver_telemetry.empty and "timestamp" in driver_telemetry.columns:
-            df = driver_telemetry.copy()
-            df['harsh_accel'] = df['acceleration'] > 4  
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            timeline = df.set_index('timestamp').resample('D')['harsh_accel'].sum()
-
-            fig, ax = plt.subplots(figsize=(10, 4))
-            timeline.plot(ax=ax, color="#e81717", linestyle='-', marker='o')
-            ax.set_title("Harsh Accelerating Events Over Time", fontsize=14, color="#8b1a1a")
-            ax.set_ylabel("Count", fontsize=12)
-            ax.grid(alpha=0.3)
-            st.pyplot(fig)
+        daily_events = load_driver_daily_harsh_events(selected_driver)
+        if not daily_events.empty:
+            timeline = daily_events['harsh_accels']
+            st.image(charts.line_png(
+                selected_driver, "harsh_accels_daily", charts.data_version(daily_events.reset_index()),
+                timeline.index, timeline.to_numpy(), color="#e81717",
+                title="Harsh Accelerating Events Over Time", ylabel="Count", title_color="#8b1a1a",
+            ))
         else:
             st.info("No telemetry data available for harsh accelerating over time.")
 
     elif selected_graph == "Speed Distribution":
-        if not driver_telemetry.empty and "speed" in driver_telemetry.columns:
-            fig, ax = plt.subplots(figsize=(8, 4))
-            sns.histplot(driver_telemetry['speed'], bins=30, kde=True, color='#17DAE8', ax=ax)
-            ax.set_title("Speed Distribution", fontsize=14, color='#3f65b6')
-            ax.set_xlabel("Speed", fontsize=12)
-            st.pyplot(fig)
+        speed_hist = load_driver_speed_histogram(selected_driver)
+        if not speed_hist.empty:
+            hist = charts.fixed_bin_histogram(speed_hist['bin'].to_numpy(), speed_hist['samples'].to_numpy(), SPEED_BIN_MPH)
+            st.image(charts.histogram_png(
+                selected_driver, "speed", charts.data_version(hist), hist, color='#17DAE8',
+                title="Speed Distribution", xlabel="Speed", title_color='#3f65b6',
+            ))
         else:
             st.info("No telemetry speed data available.")
 
     elif selected_graph == "Trip Duration Distribution":
         if not driver_trips.empty and "trip_duration_min" in driver_trips.columns:
-            fig, ax = plt.subplots(figsize=(8, 4))
-            sns.histplot(driver_trips['trip_duration_min'], bins=30, kde=True, color='#17DAE8', ax=ax)
-            ax.set_title("Trip Duration Distribution (minutes)", fontsize=14, color='#3f65b6')
-            ax.set_xlabel("Minutes", fontsize=12)
-            st.pyplot(fig)
+            hist = charts.histogram_counts(driver_trips['trip_duration_min'], bins=30)
+            st.image(charts.histogram_png(
+                selected_driver, "trip_duration", charts.data_version(hist), hist, color='#17DAE8',
+                title="Trip Duration Distribution (minutes)", xlabel="Minutes", title_color='#3f65b6',
+            ))
         else:
             st.info("No trip duration data available.")
 
+    elif selected_graph == "Trip Speed Profile":
+        telemetry = load_driver_telemetry(selected_driver)
+        if not telemetry.empty:
+            selected_trip = st.selectbox("Choose a trip", telemetry['trip_id'].astype(str).unique().tolist())
+            trip = telemetry[telemetry['trip_id'] == selected_trip]
+            st.image(charts.line_png(
+                selected_driver, f"speed_{selected_trip}", charts.data_version(trip[['timestamp', 'speed']]),
+                trip['timestamp'].to_numpy(), trip['speed'].to_numpy(), color="#17DAE8",
+                title=f"Speed Over Trip {selected_trip}", ylabel="Speed (mph)", title_color="#3f65b6",
+            ))
+        else:
+            st.info("No telemetry data available for this driver.")
+
+    elif selected_graph == "Trip Route":
+        telemetry = load_driver_telemetry(selected_driver)
+        # Rows loaded with --coord-blocks keep their coordinates in per-trip
+        # blocks and have no per-row tokens.
+        telemetry = telemetry[telemetry['lat'].notna() & telemetry['lon'].notna()]
+        if not telemetry.empty:
+            selected_trip = st.selectbox("Choose a trip", telemetry['trip_id'].astype(str).unique().tolist())
+            route, failed = decrypt_coordinates(telemetry[telemetry['trip_id'] == selected_trip])
+            if failed:
+                st.warning(f"{failed} coordinate values for {selected_trip} could not be decrypted")
+            st.map(route.dropna(subset=['lat', 'lon'])[['lat', 'lon']])
+        else:
+            st.info("No per-row coordinates available for this driver.")
+
+
+    startup_profiler.mark("first_chart")
 
     st.markdown("<div class='section-title'>🌐 All Customers Summary</div>", unsafe_allow_html=True)
     foot1, foot2, foot3, foot4 = st.columns(4)
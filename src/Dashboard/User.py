@@ -1,13 +1,10 @@
+import startup_profiler
+startup_profiler.begin_run()
 import streamlit as st
-import pandas as pd
-import sqlite3
-import os
-from cryptography.fernet import Fernet
-import joblib
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import requests
+import charts
+from scoring_client import predict_risk, stored_or_predicted_risk
+from pricing import calculate_realistic_premium, score_what_if
+from data_access import load_drivers, load_driver_scores, load_driver_trips
 
 st.set_page_config(
     page_title="Telematics User Dashboard",
@@ -15,64 +12,17 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-DB_FILE = "telematics.db"
-KEY_FILE = "secret.key"
-MODEL_PATH = "stacking_model.pkl"
 OPENWEATHER_API_KEY = "your_openweather_api_key"  
 LAT, LON = 37.5485, -121.9886  
-
-model = joblib.load(MODEL_PATH)
-
-def calculate_realistic_premium(risk_score, base_premium=2285, max_risk_score=100):
-    normalized_risk = np.clip(risk_score / max_risk_score, 0, 1)
-    scaling_factor = 1 + 0.5 * normalized_risk
-    premium_annual = base_premium * scaling_factor
-    premium_monthly = premium_annual / 12
-    return premium_annual, premium_monthly
+WEATHER_TTL_SEC = 600
 
 def predict_risk_and_premium(df):
-    features = df.drop(columns=['driver_id'])
-    predicted_risk = model.predict(features)
-    premium_list = [calculate_realistic_premium(r) for r in predicted_risk]
+    predicted_risk = stored_or_predicted_risk(df, load_driver_scores())
     df['predicted_risk_score'] = predicted_risk
-    df['premium_annual'] = [p[0] for p in premium_list]
-    df['premium_monthly'] = [p[1] for p in premium_list]
+    df['premium_annual'], df['premium_monthly'] = calculate_realistic_premium(predicted_risk)
     return df
 
-def get_connection():
-    db_path = os.path.join(os.path.dirname(__file__), DB_FILE)
-    return sqlite3.connect(db_path)
-
-def load_key():
-    key_path = os.path.join(os.path.dirname(__file__), KEY_FILE)
-    with open(key_path, "rb") as f:
-        return f.read()
-
-def decrypt_column(series, fernet):
-    decrypted = []
-    for val in series:
-        try:
-            decrypted_val = fernet.decrypt(val.encode()).decode()
-            decrypted.append(float(decrypted_val))
-        except:
-            decrypted.append(None)
-    return decrypted
-
-@st.cache_data
-def load_data():
-    with get_connection() as conn:
-        drivers = pd.read_sql("SELECT * FROM drivers", conn)
-        trips = pd.read_sql("SELECT * FROM trips", conn)
-        telemetry = pd.read_sql("SELECT * FROM telemetry_secure", conn)
-    key = load_key()
-    fernet = Fernet(key)
-    telemetry["lat"] = decrypt_column(telemetry["lat"], fernet)
-    telemetry["lon"] = decrypt_column(telemetry["lon"], fernet)
-    if 'lat_dec' in telemetry.columns: telemetry.drop(columns=['lat_dec'], inplace=True)
-    if 'lon_dec' in telemetry.columns: telemetry.drop(columns=['lon_dec'], inplace=True)
-    return drivers, trips, telemetry
-
-drivers_df, trips_df, telemetry_df = load_data()
+drivers_df = load_drivers()
 
 drivers_risk_df = predict_risk_and_premium(drivers_df.copy())
 
@@ -80,17 +30,21 @@ driver_ids = drivers_df["driver_id"].unique()
 selected_driver = st.sidebar.selectbox("Choose Your Driver ID", driver_ids)
 
 driver_info = drivers_df[drivers_df["driver_id"] == selected_driver]
-driver_trips = trips_df[trips_df["driver_id"] == selected_driver]
+driver_trips = load_driver_trips(selected_driver)
 driver_risk_df = drivers_risk_df[drivers_risk_df["driver_id"] == selected_driver]
 
 risk_score = driver_risk_df['predicted_risk_score'].values[0]
 premium_annual = driver_risk_df['premium_annual'].values[0]
 premium_monthly = driver_risk_df['premium_monthly'].values[0]
 
+@st.cache_data(ttl=WEATHER_TTL_SEC)
 def get_weather_alerts():
+    import requests
     url = f"http://api.openweathermap.org/data/2.5/onecall?lat={LAT}&lon={LON}&exclude=hourly,daily&appid={OPENWEATHER_API_KEY}"
-    response = requests.get(url)
-    data = response.json()
+    try:
+        data = requests.get(url, timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return []
     return data.get("alerts", [])
 
 weather_alerts = get_weather_alerts()
@@ -112,13 +66,7 @@ col4.metric("Annual Premium", f"${premium_annual:.2f}")
 
 st.subheader("🌙 Night Driving Overview")
 night_pct = driver_info['night_trip_pct_overall'].values[0]
-fig_night, ax_night = plt.subplots(figsize=(6,0.1))
-ax_night.add_patch(plt.Rectangle((0,0), 1, 1, color='lightgray'))
-ax_night.add_patch(plt.Rectangle((0,0), night_pct, 1, color='skyblue'))
-ax_night.set_xlim(0,1)
-ax_night.set_ylim(0,1)
-ax_night.axis('off')
-st.pyplot(fig_night)
+st.progress(float(min(max(night_pct, 0), 1)))
 st.markdown(f"<h3 style='text-align:center; color:black;'>{round(night_pct*100,2)}% of trips occur at night</h3>", unsafe_allow_html=True)
 
 st.subheader("📊 Driving Behavior Insights")
@@ -128,40 +76,35 @@ graph_choice = st.selectbox(
     ["Harsh Acceleration Over Time", "Harsh Braking Over Time", "Speed Distribution", "Trip Duration Distribution"]
 )
 
+def trip_line_chart(column, chart, color, title):
+    series = driver_trips[["trip_id", column]]
+    st.image(charts.line_png(
+        selected_driver, chart, charts.data_version(series), series["trip_id"].to_numpy(), series[column].to_numpy(),
+        color=color, title=title, ylabel="Count", xlabel="Trip ID", figsize=(6,3), rotate_xticks=True,
+    ))
+
+def trip_histogram(column, chart, color, title, xlabel):
+    hist = charts.histogram_counts(driver_trips[column], bins=10)
+    st.image(charts.histogram_png(
+        selected_driver, chart, charts.data_version(hist), hist, color=color, title=title, xlabel=xlabel, figsize=(6,3),
+    ))
+
 if graph_choice == "Harsh Acceleration Over Time":
-    fig, ax = plt.subplots(figsize=(6,3))
-    sns.lineplot(data=driver_trips, x="trip_id", y="num_harsh_accels", marker="o", color="orange", ax=ax)
-    ax.set_title("Harsh Acceleration Events Over Time")
-    ax.set_xlabel("Trip ID")
-    ax.set_ylabel("Count")
-    plt.setp(ax.get_xticklabels(), rotation=90)  
-    st.pyplot(fig)
+    trip_line_chart("num_harsh_accels", "harsh_accels_trips", "orange", "Harsh Acceleration Events Over Time")
 
 elif graph_choice == "Harsh Braking Over Time":
-    fig, ax = plt.subplots(figsize=(6,3))
-    sns.lineplot(data=driver_trips, x="trip_id", y="num_harsh_brakes", marker="o", color="red", ax=ax)
-    ax.set_title("Harsh Braking Events Over Time")
-    ax.set_xlabel("Trip ID")
-    ax.set_ylabel("Count")
-    plt.setp(ax.get_xticklabels(), rotation=90)  
-    st.pyplot(fig)
+    trip_line_chart("num_harsh_brakes", "harsh_brakes_trips", "red", "Harsh Braking Events Over Time")
 
 elif graph_choice == "Speed Distribution":
     if "avg_speed" in driver_trips.columns:
-        fig, ax = plt.subplots(figsize=(6,3))
-        sns.histplot(driver_trips["avg_speed"], bins=10, kde=True, color="green", ax=ax)
-        ax.set_title("Speed Distribution")
-        ax.set_xlabel("Average Speed (mph)")
-        st.pyplot(fig)
+        trip_histogram("avg_speed", "avg_speed", "green", "Speed Distribution", "Average Speed (mph)")
     else:
         st.write("⚠️ No average speed data available for these trips.")
 
 elif graph_choice == "Trip Duration Distribution":
-    fig, ax = plt.subplots(figsize=(6,3))
-    sns.histplot(driver_trips['trip_duration_min'], bins=10, kde=True, color='skyblue', ax=ax)
-    ax.set_title("Trip Duration Distribution")
-    ax.set_xlabel("Minutes")
-    st.pyplot(fig)
+    trip_histogram("trip_duration_min", "trip_duration", "skyblue", "Trip Duration Distribution", "Minutes")
+
+startup_profiler.mark("first_chart")
 
 st.subheader("🏅 Achievements & Badges")
 badges = []
@@ -189,21 +132,29 @@ st.write(f"You are ranked **#{rank}** out of **{total_drivers}** drivers based o
 
 st.subheader("💡 Driving Recommendations")
 tips = []
-base_premium = 2285
+what_if = score_what_if(driver_info.drop(columns=['driver_id']), predict_risk)
+what_if_risk = what_if['risk_score'].iloc[0]
+what_if_premium = what_if['premium_annual'].iloc[0]
+
+def what_if_tip(action, scenario):
+    return f"- {action} to lower your risk score to {round(what_if_risk[scenario],2)}, your annual premium could reduce to ${round(what_if_premium[scenario],2)}"
+
 if driver_info["avg_num_harsh_brakes"].values[0] > 1:
-    reduction_risk = max(0, risk_score - 10)
-    new_premium, _ = calculate_realistic_premium(reduction_risk, base_premium)
-    tips.append(f"- Reduce harsh braking to lower your risk score to {round(reduction_risk,2)}, your annual premium could reduce to ${round(new_premium,2)}")
+    tips.append(what_if_tip("Reduce harsh braking", 'harsh_braking'))
 else:
     tips.append("- Keep up the good work on braking!")
 
 if driver_info["avg_num_harsh_accels"].values[0] > 1:
-    reduction_risk = max(0, risk_score - 5)
-    new_premium, _ = calculate_realistic_premium(reduction_risk, base_premium)
-    tips.append(f"- Reduce harsh acceleration to lower your risk score to {round(reduction_risk,2)}, your annual premium could reduce to ${round(new_premium,2)}")
+    tips.append(what_if_tip("Reduce harsh acceleration", 'harsh_acceleration'))
 else:
     tips.append("- Keep up the good work on acceleration!")
 
+if driver_info["night_trip_pct_overall"].values[0] > 0.3:
+    tips.append(what_if_tip("Halve your night driving", 'night_driving'))
+
+if driver_info["num_violations"].values[0] > 0:
+    tips.append(what_if_tip("Keep a clean record as one violation ages off", 'violations'))
+
 for tip in tips:
     st.write(tip)
 
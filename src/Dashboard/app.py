@@ -1,8 +1,9 @@
+import startup_profiler
+startup_profiler.begin_run()
 import os
 import streamlit as st
 from requests_oauthlib import OAuth2Session
 from dotenv import load_dotenv
-from Admin import show_dashboard
 
 load_dotenv()
 
@@ -40,9 +41,12 @@ if st.session_state.token is None:
     login_url, state = oauth.authorization_url(authorize_url, prompt="login")  
     st.session_state.state = state
     st.markdown(f"[🔑 Login here]({login_url})")
+    startup_profiler.mark("login_page")
 
 else:
     st.success("✅ You are logged in!")
+    # Imported here so the login page never pays for the dashboard's dependencies.
+    from Admin import show_dashboard
     show_dashboard()
 
     if st.button("Logout (Streamlit)"):
@@ -0,0 +1,107 @@
+import io
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MAX_LINE_POINTS = 500
+FIGURE_CACHE_ENTRIES = 64
+
+def pyplot():
+    # matplotlib costs hundreds of ms to import, so only views that actually
+    # draw a figure pull it in.
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def data_version(df):
+    # Content hash of the (already small) chart data; cached figures are
+    # keyed on it, so they are rebuilt exactly when the data changes.
+    return f"{int(pd.util.hash_pandas_object(df, index=False).to_numpy().sum(dtype=np.uint64)):016x}"
+
+def lttb(x, y, threshold=MAX_LINE_POINTS):
+    # Largest-Triangle-Three-Buckets: keeps the first and last points and, per
+    # bucket, the point forming the largest triangle with its neighbours.
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        ax, ay = x[keep[i]], y[keep[i]]
+        area = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        keep[i + 1] = start + int(np.argmax(area))
+    return keep
+
+def histogram_counts(values, bins):
+    values = pd.Series(values).dropna().to_numpy(dtype=float)
+    counts, edges = np.histogram(values, bins=bins)
+    return pd.DataFrame({"left": edges[:-1], "width": np.diff(edges), "count": counts})
+
+def fixed_bin_histogram(bins, samples, bin_width):
+    # Stored bins are sparse; fill the gaps so bars and KDE line up.
+    full = np.arange(bins.min(), bins.max() + 1) if len(bins) else np.array([], dtype=int)
+    counts = pd.Series(samples, index=bins).reindex(full, fill_value=0).to_numpy()
+    return pd.DataFrame({"left": full * bin_width, "width": float(bin_width), "count": counts})
+
+def binned_kde(hist, grid_points=200):
+    # Gaussian KDE evaluated from bin centres and counts (Scott's bandwidth),
+    # so its cost depends on the number of bins, not on the number of samples.
+    centers = hist["left"].to_numpy() + hist["width"].to_numpy() / 2
+    counts = hist["count"].to_numpy(dtype=float)
+    total = counts.sum()
+    if total < 2:
+        return None, None
+    mean = np.average(centers, weights=counts)
+    std = np.sqrt(np.average((centers - mean) ** 2, weights=counts))
+    bandwidth = max(1.06 * std * total ** (-1 / 5), hist["width"].min() / 2)
+    grid = np.linspace(centers.min() - 3 * bandwidth, centers.max() + 3 * bandwidth, grid_points)
+    z = (grid[:, None] - centers[None, :]) / bandwidth
+    density = (np.exp(-0.5 * z ** 2) * counts).sum(axis=1) / (bandwidth * np.sqrt(2 * np.pi))
+    return grid, density * hist["width"].mean()
+
+def _figure_png(fig):
+    plt = pyplot()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES)
+def histogram_png(driver_id, chart, version, _hist, color, title, xlabel, figsize=(8, 4), title_color="black"):
+    plt = pyplot()
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.bar(_hist["left"], _hist["count"], width=_hist["width"], align="edge", color=color, alpha=0.6, edgecolor="white")
+    grid, density = binned_kde(_hist)
+    if grid is not None:
+        ax.plot(grid, density, color=color)
+    ax.set_title(title, fontsize=14, color=title_color)
+    ax.set_xlabel(xlabel, fontsize=12)
+    ax.set_ylabel("Count")
+    return _figure_png(fig)
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES)
+def line_png(driver_id, chart, version, _x, _y, color, title, ylabel, xlabel=None, figsize=(10, 4),
+             title_color="black", rotate_xticks=False):
+    # Positions drive the downsampling so string/date x values work too.
+    keep = lttb(np.arange(len(_y)), _y)
+    x = np.asarray(_x)[keep]
+    y = np.asarray(_y)[keep]
+    plt = pyplot()
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.plot(x, y, color=color, linestyle="-", marker="o")
+    ax.set_title(title, fontsize=14, color=title_color)
+    ax.set_ylabel(ylabel, fontsize=12)
+    if xlabel:
+        ax.set_xlabel(xlabel)
+    if rotate_xticks:
+        plt.setp(ax.get_xticklabels(), rotation=90)
+    ax.grid(alpha=0.3)
+    return _figure_png(fig)
@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+
+MODEL_PATH = "stacking_model.pkl"
+COMPILED_MODEL_PATH = "stacking_model.npz"
+PARITY_TOLERANCE = 1e-4
+PREDICT_BATCH_ROWS = 10_000
+
+# --- Export: needs the training stack (sklearn, xgboost) to read the pipeline ---
+
+def _flatten_sklearn_tree(tree):
+    left = tree.children_left.copy()
+    right = tree.children_right.copy()
+    feature = tree.feature.copy()
+    threshold = tree.threshold.astype(np.float64)
+    missing_left = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8)).astype(bool)
+    value = tree.value[:, 0, 0].astype(np.float64)
+    return _close_leaves(feature, threshold, left, right, missing_left, value)
+
+def _flatten_xgb_tree(tree):
+    left = np.asarray(tree["left_children"], dtype=np.int64)
+    right = np.asarray(tree["right_children"], dtype=np.int64)
+    feature = np.asarray(tree["split_indices"], dtype=np.int64)
+    conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+    # XGBoost goes left on x < cond in float32; for float32 x that is the
+    # same as x <= the next float32 below cond, so one comparison serves both.
+    threshold = np.nextafter(conditions, np.float32(-np.inf)).astype(np.float64)
+    missing_left = np.asarray(tree["default_left"], dtype=bool)
+    value = conditions.astype(np.float64)
+    return _close_leaves(feature, threshold, left, right, missing_left, value)
+
+def _close_leaves(feature, threshold, left, right, missing_left, value):
+    # Leaves point at themselves so every tree can be walked a fixed number of steps.
+    nodes = np.arange(len(left))
+    leaf = left < 0
+    left[leaf] = nodes[leaf]
+    right[leaf] = nodes[leaf]
+    feature[leaf] = 0
+    threshold[leaf] = 0.0
+    return feature, threshold, left, right, missing_left, value
+
+def _tree_depth(left, right):
+    depth = np.zeros(len(left), dtype=np.int64)
+    for node in range(len(left)):
+        for child in (left[node], right[node]):
+            if child != node:
+                depth[child] = depth[node] + 1
+    return int(depth.max())
+
+def _pack_forest(trees):
+    offsets = np.cumsum([0] + [len(t[0]) for t in trees[:-1]])
+    feature, threshold, left, right, missing_left, value = (np.concatenate(parts) for parts in zip(*trees))
+    for offset, t in zip(offsets, trees):
+        n = len(t[0])
+        left[offset:offset + n] += offset
+        right[offset:offset + n] += offset
+    return {
+        "feature": feature.astype(np.int32),
+        "threshold": threshold,
+        "left": left.astype(np.int32),
+        "right": right.astype(np.int32),
+        "missing_left": missing_left,
+        "value": value,
+        "roots": offsets.astype(np.int32),
+        "depth": np.int32(max(_tree_depth(t[2], t[3]) for t in trees)),
+    }
+
+def _compile_estimator(estimator):
+    kind = type(estimator).__name__
+    if kind in ("RandomForestRegressor", "ExtraTreesRegressor"):
+        trees = [_flatten_sklearn_tree(e.tree_) for e in estimator.estimators_]
+        return {"reduce": "mean", "offset": 0.0, "scale": 1.0}, _pack_forest(trees)
+    if kind == "GradientBoostingRegressor":
+        trees = [_flatten_sklearn_tree(e.tree_) for e in estimator.estimators_[:, 0]]
+        offset = float(np.ravel(estimator.init_.constant_)[0])
+        return {"reduce": "sum", "offset": offset, "scale": float(estimator.learning_rate)}, _pack_forest(trees)
+    if kind == "XGBRegressor":
+        model = json.loads(estimator.get_booster().save_raw(raw_format="json"))["learner"]
+        objective = model["objective"]["name"]
+        if objective != "reg:squarederror":
+            raise ValueError(f"Cannot compile XGBRegressor with objective {objective}")
+        trees = [_flatten_xgb_tree(t) for t in model["gradient_booster"]["model"]["trees"]]
+        offset = float(model["learner_model_param"]["base_score"].strip("[]"))
+        return {"reduce": "sum_float32", "offset": offset, "scale": 1.0}, _pack_forest(trees)
+    raise ValueError(f"Cannot compile estimator of type {kind}")
+
+def _compile_preprocessor(preprocessor):
+    columns = []
+    for name, transformer, cols in preprocessor.transformers_:
+        if transformer == "drop":
+            continue
+        # Newer sklearn stores fitted "passthrough" as an identity FunctionTransformer.
+        identity = type(transformer).__name__ == "FunctionTransformer" and transformer.func is None
+        if transformer == "passthrough" or identity:
+            columns.append({"kind": "passthrough", "columns": list(cols)})
+        elif type(transformer).__name__ == "OneHotEncoder" and transformer.drop is None:
+            for col, categories in zip(cols, transformer.categories_):
+                columns.append({"kind": "onehot", "column": col, "categories": [str(c) for c in categories]})
+        else:
+            raise ValueError(f"Cannot compile transformer {name} ({type(transformer).__name__})")
+    return columns
+
+def export_model(pipeline, path=COMPILED_MODEL_PATH, source_sha256=None):
+    # source_sha256 is the pkl this was compiled from; scoring_client only
+    # uses the artifact while that pkl is unchanged.
+    stack = pipeline.named_steps["model"]
+    if stack.final_estimator_.__class__.__name__ not in ("Ridge", "LinearRegression"):
+        raise ValueError("Only linear final estimators can be compiled")
+    meta = {
+        "columns": _compile_preprocessor(pipeline.named_steps["preprocessor"]),
+        "passthrough": bool(stack.passthrough),
+        "intercept": float(stack.final_estimator_.intercept_),
+        "estimators": [],
+        "source_sha256": source_sha256,
+    }
+    arrays = {"coef": np.asarray(stack.final_estimator_.coef_, dtype=np.float64).ravel()}
+    names = [name for name, est in stack.estimators if est != "drop"]
+    for name, estimator in zip(names, stack.estimators_):
+        info, forest = _compile_estimator(estimator)
+        meta["estimators"].append({"name": name, **info})
+        arrays.update({f"{name}_{key}": value for key, value in forest.items()})
+    np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+    return path
+
+# --- Inference: NumPy only ---
+
+class CompiledModel:
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_PATH):
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {key: npz[key] for key in npz.files if key != "meta"}
+            meta = json.loads(str(npz["meta"]))
+        return cls(meta, arrays)
+
+    def transform(self, df):
+        blocks = []
+        for spec in self.meta["columns"]:
+            if spec["kind"] == "passthrough":
+                blocks.append(df[spec["columns"]].to_numpy(dtype=np.float64))
+            else:
+                values = df[spec["column"]].astype(str).to_numpy()
+                blocks.append((values[:, None] == np.asarray(spec["categories"])[None, :]).astype(np.float64))
+        return np.hstack(blocks)
+
+    def _forest(self, name, x32, reduce):
+        a = self.arrays
+        feature, threshold = a[f"{name}_feature"], a[f"{name}_threshold"]
+        left, right, missing_left = a[f"{name}_left"], a[f"{name}_right"], a[f"{name}_missing_left"]
+        rows = np.arange(len(x32))[:, None]
+        node = np.broadcast_to(a[f"{name}_roots"], (len(x32), len(a[f"{name}_roots"]))).copy()
+        for _ in range(int(a[f"{name}_depth"])):
+            x = x32[rows, feature[node]]
+            go_left = np.where(np.isnan(x), missing_left[node], x <= threshold[node])
+            node = np.where(go_left, left[node], right[node])
+        leaves = a[f"{name}_value"][node]
+        if reduce == "mean":
+            return leaves.mean(axis=1)
+        if reduce == "sum_float32":
+            # XGBoost accumulates leaf values tree by tree in float32.
+            total = np.zeros(len(x32), dtype=np.float32)
+            for column in leaves.astype(np.float32).T:
+                total += column
+            return total.astype(np.float64)
+        return leaves.sum(axis=1)
+
+    def _predict_batch(self, x):
+        x32 = x.astype(np.float32)
+        stacked = []
+        for est in self.meta["estimators"]:
+            raw = self._forest(est["name"], x32, est["reduce"])
+            if est["reduce"] == "sum_float32":
+                stacked.append((np.float32(est["offset"]) + raw.astype(np.float32)).astype(np.float64))
+            else:
+                stacked.append(est["offset"] + est["scale"] * raw)
+        stacked = np.column_stack(stacked)
+        if self.meta["passthrough"]:
+            stacked = np.hstack([stacked, x])
+        return stacked @ self.arrays["coef"] + self.meta["intercept"]
+
+    def predict(self, df):
+        x = self.transform(df)
+        return np.concatenate([
+            self._predict_batch(x[start:start + PREDICT_BATCH_ROWS])
+            for start in range(0, max(len(x), 1), PREDICT_BATCH_ROWS)
+        ])[:len(x)]
+
+STARTUP_SNIPPETS = {
+    "joblib (sklearn/xgboost)": "import joblib; model = joblib.load({model!r}); model.predict(X)",
+    "compiled (NumPy)": "from compiled_model import CompiledModel; model = CompiledModel.load({compiled!r}); model.predict(X)",
+}
+
+def compare_startup(model_path, compiled_path, db_file):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, "PYTHONPATH": here}
+    model_path, compiled_path, db_file = map(os.path.abspath, (model_path, compiled_path, db_file))
+    results = {}
+    for label, snippet in STARTUP_SNIPPETS.items():
+        code = (
+            "import time, sqlite3\n"
+            "start = time.perf_counter()\n"
+            "import pandas as pd\n"
+            f"X = pd.read_sql('SELECT * FROM drivers', sqlite3.connect({db_file!r})).fillna(0).drop(columns=['driver_id'])\n"
+            + snippet.format(model=model_path, compiled=compiled_path) + "\n"
+            "elapsed = time.perf_counter() - start\n"
+            # VmHWM, unlike ru_maxrss, is not inherited from this (parent) process.
+            "peak_kb = next(l.split()[1] for l in open('/proc/self/status') if l.startswith('VmHWM'))\n"
+            "print(elapsed, int(peak_kb) / 1024)\n"
+        )
+        out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        seconds, rss_mb = map(float, out.stdout.split())
+        results[label] = (seconds, rss_mb)
+        print(f"{label:<26} load+predict {seconds:6.2f}s   peak RSS {rss_mb:7.1f} MB")
+    return results
+
+if __name__ == "__main__":
+    import sqlite3
+    import joblib
+    import pandas as pd
+    from scoring_client import model_sha256
+
+    parser = argparse.ArgumentParser(description="Compile stacking_model.pkl into a NumPy-only artifact")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--out", default=COMPILED_MODEL_PATH)
+    parser.add_argument("--db", default="telematics.db")
+    parser.add_argument("--tolerance", type=float, default=PARITY_TOLERANCE)
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.model)
+    export_model(pipeline, args.out, source_sha256=model_sha256(args.model))
+    print(f"✅ Compiled {args.model} -> {args.out}")
+
+    conn = sqlite3.connect(args.db)
+    X = pd.read_sql("SELECT * FROM drivers", conn).fillna(0).drop(columns=["driver_id"])
+    conn.close()
+    expected = pipeline.predict(X)
+    actual = CompiledModel.load(args.out).predict(X)
+    max_diff = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+    if max_diff > args.tolerance:
+        raise SystemExit(f"⚠️ Parity check failed: max |diff| {max_diff:.2e} > {args.tolerance:.0e}")
+    print(f"✅ Parity on {len(X)} drivers: max |diff| {max_diff:.2e}")
+
+    compare_startup(args.model, args.out, args.db)
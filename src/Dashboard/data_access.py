@@ -0,0 +1,109 @@
+import os
+import sys
+import sqlite3
+import pandas as pd
+import streamlit as st
+from scoring_client import model_version
+
+# The pipeline modules live one level up, in src/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from telemetry_schema import TELEMETRY_DTYPES, TRIP_DTYPES
+from speed_histogram import SPEED_BIN_MPH
+
+DB_FILE = "telematics.db"
+KEY_FILE = "secret.key"
+CACHED_DRIVERS = 16
+# lat/lon stay encrypted tokens in the cached rows.
+TELEMETRY_ROW_DTYPES = {col: dtype for col, dtype in TELEMETRY_DTYPES.items() if col not in ("lat", "lon")}
+
+def compact(df, dtypes):
+    # Cached frames are pickled per driver, so the compact pipeline dtypes
+    # also make caching cheaper.
+    return df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+
+def get_connection():
+    db_path = os.path.join(os.path.dirname(__file__), DB_FILE)
+    return sqlite3.connect(db_path)
+
+def load_key():
+    key_path = os.path.join(os.path.dirname(__file__), KEY_FILE)
+    with open(key_path, "rb") as f:
+        return f.read()
+
+@st.cache_resource
+def get_decryptor():
+    # One decryptor (worker pool and trip cache) shared by all sessions.
+    from decryption import CoordinateDecryptor
+    return CoordinateDecryptor(load_key())
+
+def decrypt_coordinates(telemetry):
+    # Not st.cache_data'd: the decryptor already caches decrypted trips, and
+    # failures must be reported on every rerun rather than cached as NaN.
+    lat, lon, failed = get_decryptor().decrypt_telemetry(telemetry)
+    return telemetry.assign(lat=lat, lon=lon), failed
+
+@st.cache_data
+def load_drivers():
+    with get_connection() as conn:
+        return pd.read_sql("SELECT * FROM drivers", conn)
+
+def load_driver_scores():
+    # Only scores from the model the dashboards would predict with are used;
+    # drivers without one (e.g. right after retraining) are predicted instead.
+    return _load_driver_scores(model_version())
+
+@st.cache_data
+def _load_driver_scores(version):
+    # Filled by score_store.refresh_driver_scores whenever drivers are loaded or updated.
+    empty = pd.DataFrame(columns=["driver_id", "predicted_risk_score"])
+    if version is None:
+        return empty
+    with get_connection() as conn:
+        try:
+            return pd.read_sql(
+                "SELECT driver_id, predicted_risk_score FROM driver_scores WHERE is_current = 1 AND model_version = ?",
+                conn, params=(version,),
+            )
+        except pd.errors.DatabaseError:
+            return empty
+
+@st.cache_data(max_entries=CACHED_DRIVERS)
+def load_driver_trips(driver_id):
+    with get_connection() as conn:
+        return compact(pd.read_sql("SELECT * FROM trips WHERE driver_id = ?", conn, params=(driver_id,)), TRIP_DTYPES)
+
+@st.cache_data(max_entries=CACHED_DRIVERS)
+def load_driver_telemetry(driver_id):
+    # Served by idx_telemetry_driver_ts; views decrypt only the rows they show.
+    with get_connection() as conn:
+        telemetry = pd.read_sql(
+            "SELECT * FROM telemetry_secure WHERE driver_id = ? ORDER BY timestamp", conn, params=(driver_id,),
+            parse_dates=["timestamp"],
+        )
+    return compact(telemetry, TELEMETRY_ROW_DTYPES)
+
+@st.cache_data(max_entries=CACHED_DRIVERS)
+def load_driver_daily_harsh_events(driver_id):
+    with get_connection() as conn:
+        try:
+            daily = pd.read_sql(
+                "SELECT day, harsh_brakes, harsh_accels FROM harsh_event_daily WHERE driver_id = ? ORDER BY day",
+                conn, params=(driver_id,), parse_dates=["day"],
+            )
+        except pd.errors.DatabaseError:
+            # Created with the telemetry; none loaded yet.
+            daily = pd.DataFrame({"day": pd.to_datetime([]), "harsh_brakes": [], "harsh_accels": []})
+    return daily.set_index("day").asfreq("D", fill_value=0)
+
+@st.cache_data(max_entries=CACHED_DRIVERS)
+def load_driver_speed_histogram(driver_id):
+    # Maintained at ingestion (speed_histogram.py), so this is a handful of
+    # rows however much the driver has driven.
+    with get_connection() as conn:
+        try:
+            return pd.read_sql(
+                "SELECT bin, samples FROM speed_histogram WHERE driver_id = ? ORDER BY bin",
+                conn, params=(driver_id,),
+            )
+        except pd.errors.DatabaseError:
+            return pd.DataFrame(columns=["bin", "samples"])
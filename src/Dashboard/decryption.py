@@ -0,0 +1,123 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from cryptography.fernet import Fernet, InvalidToken
+
+BATCH_SIZE = 5_000
+PARALLEL_MIN_TOKENS = 20_000
+CACHE_BYTES = 256 * 1024 * 1024
+ENTRY_OVERHEAD_BYTES = 256
+
+_worker_fernet = None
+
+def _init_worker(key):
+    global _worker_fernet
+    _worker_fernet = Fernet(key)
+
+def _decrypt_tokens(fernet, tokens):
+    values = np.full(len(tokens), np.nan, dtype=np.float64)
+    failures = 0
+    for i, token in enumerate(tokens):
+        try:
+            values[i] = float(fernet.decrypt(token.encode()))
+        except (InvalidToken, AttributeError, TypeError, ValueError):
+            failures += 1
+    return values, failures
+
+def _decrypt_batch(tokens):
+    return _decrypt_tokens(_worker_fernet, tokens)
+
+class CoordinateDecryptor:
+    def __init__(self, key, workers=None, batch_size=BATCH_SIZE, cache_bytes=CACHE_BYTES):
+        self.key = key
+        self.fernet = Fernet(key)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.cache_bytes = cache_bytes
+        self.cache_used_bytes = 0
+        self.failed_tokens = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.key,))
+        return self._pool
+
+    def decrypt(self, tokens):
+        tokens = list(tokens)
+        if self.workers == 1 or len(tokens) < PARALLEL_MIN_TOKENS:
+            values, failures = _decrypt_tokens(self.fernet, tokens)
+        else:
+            batches = [tokens[i:i + self.batch_size] for i in range(0, len(tokens), self.batch_size)]
+            results = list(self._get_pool().map(_decrypt_batch, batches))
+            values = np.concatenate([v for v, _ in results])
+            failures = sum(f for _, f in results)
+        with self._lock:
+            self.failed_tokens += failures
+        return values, failures
+
+    def _cache_get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.cache_misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return entry
+
+    def _cache_put(self, key, lat, lon):
+        size = lat.nbytes + lon.nbytes + ENTRY_OVERHEAD_BYTES
+        if size > self.cache_bytes:
+            return
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = (lat, lon)
+            self.cache_used_bytes += size
+            while self.cache_used_bytes > self.cache_bytes:
+                _, (old_lat, old_lon) = self._cache.popitem(last=False)
+                self.cache_used_bytes -= old_lat.nbytes + old_lon.nbytes + ENTRY_OVERHEAD_BYTES
+
+    def decrypt_telemetry(self, telemetry):
+        # Trips are cached as (trip_id, row count) -> (lat, lon); every trip
+        # that misses is decrypted together in one batched call.
+        lat = np.full(len(telemetry), np.nan, dtype=np.float64)
+        lon = np.full(len(telemetry), np.nan, dtype=np.float64)
+        missing = []
+        for trip_id, positions in telemetry.groupby("trip_id", sort=False).indices.items():
+            cached = self._cache_get((trip_id, len(positions)))
+            if cached is None:
+                missing.append((trip_id, positions))
+            else:
+                lat[positions], lon[positions] = cached
+        if not missing:
+            return lat, lon, 0
+
+        positions = np.concatenate([p for _, p in missing])
+        tokens = np.concatenate([telemetry["lat"].to_numpy()[positions], telemetry["lon"].to_numpy()[positions]])
+        values, failures = self.decrypt(tokens)
+        lat[positions], lon[positions] = values[:len(positions)], values[len(positions):]
+        # Trips with failed tokens aren't cached, so they are retried (and
+        # reported again) next time rather than served as NaN.
+        for trip_id, trip_positions in missing:
+            trip_lat, trip_lon = lat[trip_positions], lon[trip_positions]
+            if not (np.isnan(trip_lat).any() or np.isnan(trip_lon).any()):
+                self._cache_put((trip_id, len(trip_positions)), trip_lat, trip_lon)
+        return lat, lon, failures
+
+    def stats(self):
+        with self._lock:
+            return {
+                "failed_tokens": self.failed_tokens,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "cache_entries": len(self._cache),
+                "cache_used_bytes": self.cache_used_bytes,
+            }
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+BASE_PREMIUM = 2285
+MAX_RISK_SCORE = 100
+
+def calculate_realistic_premium(risk_score, base_premium=BASE_PREMIUM, max_risk_score=MAX_RISK_SCORE):
+    # Works on scalars or whole arrays of scores; base_premium may be an array
+    # of per-driver (e.g. per-segment) base premiums of the same length.
+    normalized_risk = np.clip(np.asarray(risk_score, dtype=float) / max_risk_score, 0, 1)
+    scaling_factor = 1 + 0.5 * normalized_risk
+    premium_annual = np.asarray(base_premium, dtype=float) * scaling_factor
+    premium_monthly = premium_annual / 12
+    return premium_annual, premium_monthly
+
+def segment_base_premiums(segments, base_by_segment, default=BASE_PREMIUM):
+    return pd.Series(segments).map(base_by_segment).fillna(default).to_numpy(dtype=float)
+
+def _reduce_harsh_braking(features):
+    features['total_harsh_brakes'] = features['total_harsh_brakes'] * 0.5
+    features['avg_num_harsh_brakes'] = features['avg_num_harsh_brakes'] * 0.5
+    return features
+
+def _reduce_harsh_acceleration(features):
+    features['total_harsh_accels'] = features['total_harsh_accels'] * 0.5
+    features['avg_num_harsh_accels'] = features['avg_num_harsh_accels'] * 0.5
+    return features
+
+def _reduce_night_driving(features):
+    features['night_trip_pct_overall'] = features['night_trip_pct_overall'] * 0.5
+    return features
+
+def _fewer_violations(features):
+    features['num_violations'] = (features['num_violations'] - 1).clip(lower=0)
+    features['claims_weighted_score'] = features['num_claims'] * 25 + features['num_violations'] * 15
+    return features
+
+WHAT_IF_SCENARIOS = {
+    'harsh_braking': _reduce_harsh_braking,
+    'harsh_acceleration': _reduce_harsh_acceleration,
+    'night_driving': _reduce_night_driving,
+    'violations': _fewer_violations,
+}
+
+def score_what_if(features, predict, scenarios=WHAT_IF_SCENARIOS, base_premium=BASE_PREMIUM):
+    # Baseline plus every scenario for every driver go through one predict call.
+    variants = [features] + [apply(features.copy()) for apply in scenarios.values()]
+    risk = np.asarray(predict(pd.concat(variants, ignore_index=True)), dtype=float).reshape(len(variants), len(features))
+    annual, _ = calculate_realistic_premium(risk, base_premium)
+    names = ['baseline'] + list(scenarios)
+    return pd.concat(
+        {'risk_score': pd.DataFrame(risk.T, index=features.index, columns=names),
+         'premium_annual': pd.DataFrame(annual.T, index=features.index, columns=names)},
+        axis=1,
+    )
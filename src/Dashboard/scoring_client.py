@@ -0,0 +1,80 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+import numpy as np
+
+SCORING_URL = os.getenv("SCORING_URL", "http://127.0.0.1:8765")
+MODEL_PATH = "stacking_model.pkl"
+COMPILED_MODEL_PATH = "stacking_model.npz"
+
+@lru_cache(maxsize=4)
+def _file_sha256(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def model_sha256(model_path=MODEL_PATH):
+    # Rehashed only when the file changes (mtime/size), not on every rerun.
+    if not os.path.exists(model_path):
+        return None
+    stat = os.stat(model_path)
+    return _file_sha256(model_path, stat.st_mtime_ns, stat.st_size)
+
+def model_version(model_path=MODEL_PATH):
+    # Same id score_store.model_version stores with each driver score.
+    sha = model_sha256(model_path)
+    return sha[:16] if sha else None
+
+@lru_cache(maxsize=1)
+def _load_local_model(sha):
+    # The compiled artifact (see compiled_model.py) avoids importing
+    # sklearn/xgboost, but only if it was compiled from the current pkl.
+    if os.path.exists(COMPILED_MODEL_PATH):
+        from compiled_model import CompiledModel
+        compiled = CompiledModel.load(COMPILED_MODEL_PATH)
+        if sha is None or compiled.meta.get("source_sha256") == sha:
+            return compiled
+        print(f"⚠️ {COMPILED_MODEL_PATH} was not compiled from the current {MODEL_PATH}; using the pkl")
+    import joblib
+    return joblib.load(MODEL_PATH)
+
+def load_local_model():
+    # Keyed on the pkl's hash, so a retrained model is picked up without a restart.
+    return _load_local_model(model_sha256())
+
+def request_predictions(features, url=SCORING_URL, timeout=10):
+    request = Request(
+        f"{url}/predict",
+        data=features.to_json(orient="split", index=False).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urlopen(request, timeout=timeout) as response:
+        return np.asarray(json.load(response)["predictions"], dtype=float)
+
+def predict_risk(features):
+    # Falls back to an in-process model when no scoring service is running or
+    # it doesn't answer in time. An error response means the service is up but
+    # broken, so it is reported before falling back.
+    try:
+        return request_predictions(features)
+    except HTTPError as e:
+        print(f"⚠️ Scoring service returned HTTP {e.code}: {e.read().decode(errors='replace')[:200]}; scoring locally")
+    except TimeoutError:
+        print(f"⚠️ Scoring service at {SCORING_URL} timed out; scoring locally")
+    except (URLError, ConnectionError):
+        pass
+    return load_local_model().predict(features)
+
+def stored_or_predicted_risk(drivers_df, stored_scores):
+    # Scores persisted at ingestion are reused; only drivers without a
+    # current stored score are sent to the model.
+    risk = drivers_df["driver_id"].map(stored_scores.set_index("driver_id")["predicted_risk_score"])
+    missing = risk.isna().to_numpy()
+    if missing.any():
+        risk[missing] = predict_risk(drivers_df.loc[missing].drop(columns=["driver_id"]))
+    return risk.to_numpy(dtype=float)
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import time
+import argparse
+import builtins
+import threading
+
+# Off unless DASHBOARD_PROFILE is set: then imports are timed and each
+# milestone is appended to STARTUP_LOG. While off, __import__ is untouched
+# and nothing is written.
+ENABLED = bool(os.getenv("DASHBOARD_PROFILE"))
+STARTUP_LOG = os.getenv("DASHBOARD_STARTUP_LOG", "startup_profile.jsonl")
+STARTUP_BUDGETS_SEC = {
+    "login_page": 1.0,
+    "first_chart": 3.0,
+}
+TOP_IMPORTS = 15
+
+PROCESS_START = time.perf_counter()
+_import_times = {}
+_local = threading.local()
+_original_import = builtins.__import__
+_run_start = PROCESS_START
+_marked = set()
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Only first-time absolute imports are timed; cached modules cost nothing.
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        cumulative, own = _import_times.get(name, (0.0, 0.0))
+        _import_times[name] = (cumulative + elapsed, own + elapsed - children)
+
+def begin_run():
+    global _run_start
+    if not ENABLED:
+        return
+    if builtins.__import__ is not _timed_import:
+        builtins.__import__ = _timed_import
+    _run_start = time.perf_counter()
+
+def import_report(top=TOP_IMPORTS):
+    ranked = sorted(_import_times.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return [{"module": name, "cumulative_sec": round(cum, 4), "self_sec": round(own, 4)} for name, (cum, own) in ranked]
+
+def mark(milestone, log_file=STARTUP_LOG):
+    if not ENABLED:
+        return None
+    now = time.perf_counter()
+    record = {
+        "milestone": milestone,
+        "seconds": round(now - _run_start, 4),
+        "since_process_start": round(now - PROCESS_START, 4),
+        "budget": STARTUP_BUDGETS_SEC.get(milestone),
+        "cold": milestone not in _marked,
+        "ts": time.time(),
+    }
+    record["over_budget"] = record["budget"] is not None and record["seconds"] > record["budget"]
+    if record["cold"]:
+        record["imports"] = import_report()
+    _marked.add(milestone)
+    with open(log_file, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    if record["over_budget"]:
+        print(f"⚠️ {milestone} took {record['seconds']:.2f}s (budget {record['budget']:.2f}s)")
+    return record
+
+def summarize(log_file=STARTUP_LOG):
+    with open(log_file) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    for milestone in sorted({r["milestone"] for r in records}):
+        runs = [r for r in records if r["milestone"] == milestone]
+        cold = [r for r in runs if r["cold"]]
+        warm = sorted(r["seconds"] for r in runs if not r["cold"])
+        budget = STARTUP_BUDGETS_SEC.get(milestone)
+        over = sum(r["over_budget"] for r in runs)
+        print(f"{milestone}: budget {budget}s, {over}/{len(runs)} renders over budget")
+        if cold:
+            print(f"  last cold start: {cold[-1]['seconds']:.3f}s")
+            for row in cold[-1]["imports"]:
+                print(f"    {row['module']:<32} {row['cumulative_sec']:8.3f}s cumulative {row['self_sec']:8.3f}s self")
+        if warm:
+            print(f"  warm p50: {warm[len(warm) // 2]:.3f}s  max: {warm[-1]:.3f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize dashboard startup timings (recorded with DASHBOARD_PROFILE=1) against budgets")
+    parser.add_argument("--log", default=STARTUP_LOG)
+    args = parser.parse_args()
+    summarize(args.log)
@@ -1,79 +1,108 @@
 import pandas as pd
 import numpy as np
+import argparse
+import pipeline_metrics
+import pipeline_storage
 
-def aggregate_driver_features(trip_df):
-    driver_features = []
-    np.random.seed(42)  
-    
-    driver_ids = trip_df['driver_id'].unique()
-    num_drivers = len(driver_ids)
+VEHICLE_TYPES = ['Sedan', 'SUV', 'Sports Car', 'Truck', 'Electric']
+VEHICLE_TYPE_PROBS = [0.5, 0.25, 0.1, 0.1, 0.05]
+DURATION_WEIGHTED_PCTS = {
+    'night_trip_pct': 'night_trip_pct_overall',
+    'idling_pct': 'idling_pct_overall',
+    'urban_pct': 'urban_pct_overall',
+    'highway_pct': 'highway_pct_overall',
+}
 
-    years_driving = np.random.randint(1, 30, num_drivers)
-    num_claims = np.random.poisson(0.3, num_drivers)
-    num_violations = np.random.poisson(0.5, num_drivers)
-    vehicle_age = np.random.randint(0, 15, num_drivers)
-    vehicle_types = ['Sedan', 'SUV', 'Sports Car', 'Truck', 'Electric']
-    vehicle_type_choices = np.random.choice(vehicle_types, num_drivers, p=[0.5, 0.25, 0.1, 0.1, 0.05])
-    insurance_policy_length_years = np.random.randint(1, 10, num_drivers)
-    
-    for i, driver_id in enumerate(driver_ids):
-        trips = trip_df[trip_df['driver_id'] == driver_id]
-        num_trips = len(trips)
-        total_miles = trips['total_miles'].sum()
-        total_drive_time_min = trips['trip_duration_min'].sum()
-        avg_trip_duration_min = trips['trip_duration_min'].mean()
-        avg_trip_miles = trips['total_miles'].mean()
-        avg_speed_overall = trips['avg_speed'].mean()
-        max_speed_overall = trips['max_speed'].max()
-        total_harsh_brakes = trips['num_harsh_brakes'].sum()
-        total_harsh_accels = trips['num_harsh_accels'].sum()
-        avg_num_harsh_brakes = trips['num_harsh_brakes'].mean()
-        avg_num_harsh_accels = trips['num_harsh_accels'].mean()
-        
-        night_trip_pct_overall = (trips['night_trip_pct'] * trips['trip_duration_min']).sum() / total_drive_time_min if total_drive_time_min > 0 else 0
-        idling_pct_overall = (trips['idling_pct'] * trips['trip_duration_min']).sum() / total_drive_time_min if total_drive_time_min > 0 else 0
-        urban_pct_overall = (trips['urban_pct'] * trips['trip_duration_min']).sum() / total_drive_time_min if total_drive_time_min > 0 else 0
-        highway_pct_overall = (trips['highway_pct'] * trips['trip_duration_min']).sum() / total_drive_time_min if total_drive_time_min > 0 else 0
+def simulate_driver_history(num_drivers, seed=42):
+    rng = np.random.RandomState(seed)
+    years_driving = rng.randint(1, 30, num_drivers)
+    num_claims = rng.poisson(0.3, num_drivers)
+    num_violations = rng.poisson(0.5, num_drivers)
+    vehicle_age = rng.randint(0, 15, num_drivers)
+    vehicle_type_choices = rng.choice(VEHICLE_TYPES, num_drivers, p=VEHICLE_TYPE_PROBS)
+    insurance_policy_length_years = rng.randint(1, 10, num_drivers)
+    return pd.DataFrame({
+        'years_driving': years_driving,
+        'num_claims': num_claims,
+        'num_violations': num_violations,
+        'vehicle_age': vehicle_age,
+        'vehicle_type': vehicle_type_choices,
+        'insurance_policy_length_years': insurance_policy_length_years,
+        'claims_weighted_score': num_claims * 25 + num_violations * 15,
+    })
 
-        years_exp = years_driving[i]
-        claims = num_claims[i]
-        violations = num_violations[i]
-        veh_age = vehicle_age[i]
-        veh_type = vehicle_type_choices[i]
-        policy_length = insurance_policy_length_years[i]
+DRIVER_ACCUMULATORS = {
+    'num_trips': 'sum',
+    'total_miles': 'sum',
+    'total_drive_time_min': 'sum',
+    'avg_speed_sum': 'sum',
+    'max_speed_overall': 'max',
+    'total_harsh_brakes': 'sum',
+    'total_harsh_accels': 'sum',
+    **{f'{pct}_weighted': 'sum' for pct in DURATION_WEIGHTED_PCTS},
+}
 
-        claims_weighted_score = claims * 25 + violations * 15
-        
-        driver_features.append({
-            'driver_id': driver_id,
-            'num_trips': num_trips,
-            'total_miles': total_miles,
-            'total_drive_time_min': total_drive_time_min,
-            'avg_trip_duration_min': avg_trip_duration_min,
-            'avg_trip_miles': avg_trip_miles,
-            'avg_speed_overall': avg_speed_overall,
-            'max_speed_overall': max_speed_overall,
-            'total_harsh_brakes': total_harsh_brakes,
-            'total_harsh_accels': total_harsh_accels,
-            'avg_num_harsh_brakes': avg_num_harsh_brakes,
-            'avg_num_harsh_accels': avg_num_harsh_accels,
-            'night_trip_pct_overall': night_trip_pct_overall,
-            'idling_pct_overall': idling_pct_overall,
-            'urban_pct_overall': urban_pct_overall,
-            'highway_pct_overall': highway_pct_overall,
-            'years_driving': years_exp,
-            'num_claims': claims,
-            'num_violations': violations,
-            'vehicle_age': veh_age,
-            'vehicle_type': veh_type,
-            'insurance_policy_length_years': policy_length,
-            'claims_weighted_score': claims_weighted_score
-        })
-    
-    return pd.DataFrame(driver_features)
+def accumulate_driver_trips(trip_df):
+    trips = pd.DataFrame({
+        'driver_id': trip_df['driver_id'],
+        'num_trips': np.ones(len(trip_df), dtype=np.int64),
+        'total_miles': trip_df['total_miles'],
+        'total_drive_time_min': trip_df['trip_duration_min'],
+        'avg_speed_sum': trip_df['avg_speed'],
+        'max_speed_overall': trip_df['max_speed'],
+        'total_harsh_brakes': trip_df['num_harsh_brakes'],
+        'total_harsh_accels': trip_df['num_harsh_accels'],
+        **{f'{pct}_weighted': trip_df[pct] * trip_df['trip_duration_min'] for pct in DURATION_WEIGHTED_PCTS},
+    })
+    acc = trips.groupby('driver_id', sort=False, observed=True).agg(DRIVER_ACCUMULATORS)
+    # Drivers are ordered by their smallest trip_id, whatever order the trips
+    # arrive in (CSV chunks vs Parquet). On trip_id-sorted input that is
+    # first-appearance order, so simulated history, drawn by position, goes
+    # to the same drivers as in data/driver_data.csv.
+    first_trip = trip_df['trip_id'].astype(str).groupby(trip_df['driver_id'], sort=False, observed=True).min()
+    return acc.reindex(first_trip.sort_values(kind='stable').index)
+
+def derive_driver_features(driver_acc):
+    num_trips = driver_acc['num_trips']
+    total_time = driver_acc['total_drive_time_min']
+    drivers = pd.DataFrame({
+        'num_trips': num_trips,
+        'total_miles': driver_acc['total_miles'],
+        'total_drive_time_min': total_time,
+        'avg_trip_duration_min': total_time / num_trips,
+        'avg_trip_miles': driver_acc['total_miles'] / num_trips,
+        'avg_speed_overall': driver_acc['avg_speed_sum'] / num_trips,
+        'max_speed_overall': driver_acc['max_speed_overall'],
+        'total_harsh_brakes': driver_acc['total_harsh_brakes'],
+        'total_harsh_accels': driver_acc['total_harsh_accels'],
+        'avg_num_harsh_brakes': driver_acc['total_harsh_brakes'] / num_trips,
+        'avg_num_harsh_accels': driver_acc['total_harsh_accels'] / num_trips,
+    }, index=driver_acc.index)
+    for pct, overall in DURATION_WEIGHTED_PCTS.items():
+        numerator = driver_acc[f'{pct}_weighted']
+        drivers[overall] = np.where(total_time > 0, numerator / total_time.where(total_time > 0, 1), 0)
+    return drivers.rename_axis('driver_id').reset_index()
+
+def aggregate_driver_features(trip_df, seed=42):
+    with pipeline_metrics.span("groupby", rows=len(trip_df)):
+        drivers = derive_driver_features(accumulate_driver_trips(trip_df))
+    with pipeline_metrics.span("simulate_history", rows=len(drivers)):
+        history = simulate_driver_history(len(drivers), seed=seed)
+    return pd.concat([drivers, history], axis=1)
 
 if __name__ == "__main__":
-    trip_df = pd.read_csv('trip_data.csv')
-    driver_df = aggregate_driver_features(trip_df)
-    driver_df.to_csv('driver_data.csv', index=False)
-    print("Driver-level features with simulated history and vehicle info saved to driver_data.csv")
+    parser = argparse.ArgumentParser(description="Aggregate trip features into driver-level features")
+    parser.add_argument("--storage", choices=pipeline_storage.STORAGE_FORMATS, default="csv")
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure(args, "Driver_features")
+
+    with pipeline_metrics.span("Driver_features"):
+        with pipeline_metrics.span(f"read_{args.storage}") as span:
+            trip_df = pipeline_storage.read_dataset("trips", args.storage)
+            span.rows = len(trip_df)
+        with pipeline_metrics.span("aggregate_driver_features", rows=len(trip_df)):
+            driver_df = aggregate_driver_features(trip_df)
+        with pipeline_metrics.span(f"write_{args.storage}", rows=len(driver_df)):
+            path = pipeline_storage.write_dataset(driver_df, "drivers", args.storage)
+    print(f"Driver-level features with simulated history and vehicle info saved to {path}")
@@ -1,4 +1,8 @@
 DROP TABLE IF EXISTS telemetry;
+-- Created by load_db.py; dropped here with the harsh_*/speed_histogram
+-- tables derived from them so a reload starts them all empty.
+DROP TABLE IF EXISTS telemetry_secure;
+DROP TABLE IF EXISTS telemetry_coord_blocks;
 DROP TABLE IF EXISTS trips;
 DROP TABLE IF EXISTS drivers;
 
@@ -58,3 +62,17 @@ CREATE TABLE telemetry (
     FOREIGN KEY (trip_id) REFERENCES trips(trip_id),
     FOREIGN KEY (driver_id) REFERENCES drivers(driver_id)
 );
+
+-- The tables below are created (CREATE TABLE IF NOT EXISTS) by the modules
+-- that maintain them: driver_store.py, harsh_events.py, score_store.py,
+-- speed_histogram.py and risk_normalization.py. They are only dropped here,
+-- so a reload starts them empty.
+DROP TABLE IF EXISTS driver_accumulators;
+DROP TABLE IF EXISTS driver_applied_trips;
+DROP TABLE IF EXISTS harsh_events;
+DROP TABLE IF EXISTS harsh_event_daily;
+DROP TABLE IF EXISTS driver_scores;
+DROP TABLE IF EXISTS speed_histogram;
+DROP TABLE IF EXISTS risk_norm_observed;
+DROP TABLE IF EXISTS risk_norm_versions;
+DROP TABLE IF EXISTS driver_risk_labels;
@@ -0,0 +1,110 @@
+import sqlite3
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from cryptography.fernet import Fernet
+
+DB_FILE = "telematics.db"
+KEY_FILE = "secret.key"
+COORD_DTYPES = {"float32": "<f4", "float64": "<f8"}
+
+def create_coordinate_blocks_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS telemetry_coord_blocks (
+            trip_id TEXT PRIMARY KEY,
+            driver_id TEXT,
+            num_points INTEGER,
+            dtype TEXT,
+            coords BLOB
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_coord_blocks_driver ON telemetry_coord_blocks (driver_id)")
+    conn.commit()
+
+def pack_coordinates(lat, lon, fernet, dtype="float64"):
+    fmt = COORD_DTYPES[dtype]
+    payload = np.asarray(lat, dtype=fmt).tobytes() + np.asarray(lon, dtype=fmt).tobytes()
+    return fernet.encrypt(payload)
+
+def unpack_coordinates(token, num_points, fernet, dtype="float64"):
+    values = np.frombuffer(fernet.decrypt(token), dtype=COORD_DTYPES[dtype]).astype(np.float64)
+    return values[:num_points], values[num_points:]
+
+def coordinate_index(df):
+    # Each telemetry row stores its position in its trip's block, so rows
+    # and blocks are joined on (trip_id, coord_index), not on row order.
+    return df.groupby("trip_id", sort=False, observed=True).cumcount()
+
+def insert_coordinate_blocks(df, conn, fernet, dtype="float64"):
+    # df must be in coord_index order within each trip.
+    rows = []
+    for trip_id, trip in df.groupby("trip_id", sort=False, observed=True):
+        rows.append((
+            trip_id,
+            trip["driver_id"].iloc[0],
+            len(trip),
+            dtype,
+            pack_coordinates(trip["lat"].to_numpy(), trip["lon"].to_numpy(), fernet, dtype),
+        ))
+    conn.executemany(
+        "INSERT OR REPLACE INTO telemetry_coord_blocks (trip_id, driver_id, num_points, dtype, coords) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    return len(rows)
+
+def read_trip_coordinates(conn, fernet, trip_id):
+    row = conn.execute(
+        "SELECT num_points, dtype, coords FROM telemetry_coord_blocks WHERE trip_id = ?", (trip_id,)
+    ).fetchone()
+    if row is None:
+        raise KeyError(f"No coordinate block for trip {trip_id}")
+    num_points, dtype, token = row
+    return unpack_coordinates(token, num_points, fernet, dtype)
+
+def read_telemetry_coordinates(conn, fernet, telemetry):
+    # lat/lon for telemetry_secure rows written with --coord-blocks, aligned
+    # to the rows of `telemetry` (which needs trip_id and coord_index).
+    lat = np.full(len(telemetry), np.nan)
+    lon = np.full(len(telemetry), np.nan)
+    for trip_id, positions in telemetry.groupby("trip_id", sort=False, observed=True).indices.items():
+        trip_lat, trip_lon = read_trip_coordinates(conn, fernet, trip_id)
+        index = telemetry["coord_index"].to_numpy()[positions].astype(np.int64)
+        lat[positions], lon[positions] = trip_lat[index], trip_lon[index]
+    return lat, lon
+
+def read_driver_coordinates(conn, fernet, driver_id):
+    coords = {}
+    for trip_id, num_points, dtype, token in conn.execute(
+        "SELECT trip_id, num_points, dtype, coords FROM telemetry_coord_blocks WHERE driver_id = ?", (driver_id,)
+    ):
+        coords[trip_id] = unpack_coordinates(token, num_points, fernet, dtype)
+    return coords
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-value and per-trip coordinate encryption")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--key", default=KEY_FILE)
+    args = parser.parse_args()
+
+    with open(args.key, "rb") as f:
+        fernet = Fernet(f.read())
+    conn = sqlite3.connect(args.db)
+
+    per_value_bytes = conn.execute("SELECT SUM(LENGTH(lat) + LENGTH(lon)), COUNT(*) FROM telemetry_secure WHERE lat IS NOT NULL").fetchone()
+    block_bytes = conn.execute("SELECT SUM(LENGTH(coords)), SUM(num_points) FROM telemetry_coord_blocks").fetchone()
+    print(f"per-value tokens: {per_value_bytes[0] or 0:,} bytes for {per_value_bytes[1]:,} points")
+    print(f"per-trip blocks : {block_bytes[0] or 0:,} bytes for {block_bytes[1] or 0:,} points")
+
+    start = time.perf_counter()
+    values = pd.read_sql("SELECT lat, lon FROM telemetry_secure WHERE lat IS NOT NULL", conn)
+    for col in ("lat", "lon"):
+        values[col].map(lambda v: float(fernet.decrypt(v.encode())))
+    per_value_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for num_points, dtype, token in conn.execute("SELECT num_points, dtype, coords FROM telemetry_coord_blocks"):
+        unpack_coordinates(token, num_points, fernet, dtype)
+    block_sec = time.perf_counter() - start
+    conn.close()
+    print(f"decrypt all     : per-value {per_value_sec:.2f}s, per-trip {block_sec:.3f}s")
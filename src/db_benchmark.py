@@ -0,0 +1,75 @@
+import sqlite3
+import argparse
+import os
+import tempfile
+import time
+from cryptography.fernet import Fernet
+from telematics_simulator import simulate_telemetry_df
+from load_db import (
+    bulk_insert, connect_bulk, create_secondary_indexes, create_telemetry_secure_table,
+    drop_secondary_indexes, encrypt_telemetry,
+)
+
+DASHBOARD_QUERIES = {
+    "driver telemetry": "SELECT timestamp, speed, acceleration FROM telemetry_secure WHERE driver_id = ?",
+    "driver daily harsh brakes": (
+        "SELECT date(timestamp) AS day, SUM(acceleration < -4) FROM telemetry_secure "
+        "WHERE driver_id = ? GROUP BY day"
+    ),
+}
+
+def time_queries(conn, driver_ids, repeats=5):
+    latencies = {}
+    for name, sql in DASHBOARD_QUERIES.items():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for driver_id in driver_ids:
+                conn.execute(sql, (driver_id,)).fetchall()
+        latencies[name] = (time.perf_counter() - start) / (repeats * len(driver_ids)) * 1000
+    return latencies
+
+def load_default(db_file, insert_df, indexed=False):
+    conn = sqlite3.connect(db_file)
+    create_telemetry_secure_table(conn)
+    if indexed:
+        conn.execute("CREATE TABLE IF NOT EXISTS trips (trip_id TEXT PRIMARY KEY, driver_id TEXT)")
+        create_secondary_indexes(conn)
+    start = time.perf_counter()
+    insert_df.to_sql("telemetry_secure", conn, if_exists="append", index=False)
+    conn.commit()
+    return conn, time.perf_counter() - start
+
+def load_bulk(db_file, insert_df):
+    conn = connect_bulk(db_file)
+    create_telemetry_secure_table(conn)
+    drop_secondary_indexes(conn)
+    conn.execute("CREATE TABLE IF NOT EXISTS trips (trip_id TEXT PRIMARY KEY, driver_id TEXT)")
+    start = time.perf_counter()
+    bulk_insert(conn, "telemetry_secure", insert_df)
+    create_secondary_indexes(conn)
+    return conn, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark default vs bulk SQLite telemetry loading")
+    parser.add_argument("--drivers", type=int, default=100)
+    parser.add_argument("--trips", type=int, default=10)
+    args = parser.parse_args()
+
+    telemetry = simulate_telemetry_df(args.drivers, args.trips, seed=0)
+    insert_df = encrypt_telemetry(telemetry, Fernet(Fernet.generate_key()))
+    driver_ids = telemetry["driver_id"].drop_duplicates().sample(min(20, args.drivers), random_state=0).tolist()
+    print(f"{len(insert_df):,} telemetry rows, {args.drivers} drivers")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        loaders = [
+            ("to_sql, no indexes", load_default),
+            ("to_sql, indexes during load", lambda db, df: load_default(db, df, indexed=True)),
+            ("bulk, indexes after load", load_bulk),
+        ]
+        for i, (name, loader) in enumerate(loaders):
+            conn, load_sec = loader(os.path.join(tmp, f"bench_{i}.db"), insert_df)
+            latencies = time_queries(conn, driver_ids)
+            conn.close()
+            print(f"{name:<28}: {len(insert_df) / load_sec:>10,.0f} rows/s ({load_sec:.2f}s)")
+            for query, ms in latencies.items():
+                print(f"    {query:<26}: {ms:8.2f} ms/query")
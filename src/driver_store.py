@@ -0,0 +1,183 @@
+import sqlite3
+import argparse
+import pandas as pd
+import score_store
+import risk_normalization
+import pipeline_storage
+from Driver_features import DRIVER_ACCUMULATORS, accumulate_driver_trips, derive_driver_features, simulate_driver_history
+
+DB_FILE = "telematics.db"
+
+ACCUMULATOR_COLUMNS = list(DRIVER_ACCUMULATORS)
+MAX_ACCUMULATORS = {c for c, how in DRIVER_ACCUMULATORS.items() if how == 'max'}
+
+def create_accumulator_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS driver_accumulators (
+            driver_id TEXT PRIMARY KEY,
+            driver_seq INTEGER NOT NULL,
+            num_trips INTEGER,
+            total_miles REAL,
+            total_drive_time_min REAL,
+            avg_speed_sum REAL,
+            max_speed_overall REAL,
+            total_harsh_brakes INTEGER,
+            total_harsh_accels INTEGER,
+            night_trip_pct_weighted REAL,
+            idling_pct_weighted REAL,
+            urban_pct_weighted REAL,
+            highway_pct_weighted REAL
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS driver_applied_trips (
+            trip_id TEXT PRIMARY KEY,
+            driver_id TEXT
+        ) WITHOUT ROWID;
+    """)
+
+def _rows(df):
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_numpy().tolist()
+
+def _stage_driver_ids(conn, driver_ids):
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_drivers (driver_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM batch_drivers")
+    conn.executemany("INSERT INTO batch_drivers (driver_id) VALUES (?)", [(d,) for d in driver_ids])
+
+def _record_applied_trips(conn, trips_df):
+    conn.executemany(
+        "INSERT INTO driver_applied_trips (trip_id, driver_id) VALUES (?, ?)",
+        _rows(trips_df[['trip_id', 'driver_id']]),
+    )
+
+def _unapplied_trips(conn, trips_df):
+    # Trips already folded in (or sent twice in one batch) are skipped, so
+    # re-sending a batch leaves the accumulators unchanged.
+    trips_df = trips_df.drop_duplicates('trip_id')
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_trips (trip_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM batch_trips")
+    conn.executemany("INSERT INTO batch_trips (trip_id) VALUES (?)", [(t,) for t in trips_df['trip_id'].astype(str)])
+    applied = {row[0] for row in conn.execute("SELECT trip_id FROM batch_trips JOIN driver_applied_trips USING (trip_id)")}
+    return trips_df[~trips_df['trip_id'].astype(str).isin(applied)]
+
+def _upsert_trips(conn, trips_df):
+    # The batch's trips go into trips too, so trip lists and counts read from
+    # it agree with the accumulated driver features.
+    table_columns = [row[1] for row in conn.execute("PRAGMA table_info(trips)")]
+    columns = [c for c in trips_df.columns if c in table_columns]
+    conn.executemany(
+        f"INSERT OR REPLACE INTO trips ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        _rows(trips_df[columns]),
+    )
+
+def _seed_accumulators(conn):
+    # A full load_db run fills trips and drivers but not the accumulators.
+    # Before a batch driver's first incremental update, fold in the trips it
+    # already has, so the update adds to its history instead of replacing it.
+    has_trips = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trips'").fetchone()
+    if not has_trips:
+        return 0
+    trips = pd.read_sql("""
+        SELECT t.* FROM trips t JOIN batch_drivers b USING (driver_id)
+        WHERE t.driver_id NOT IN (SELECT driver_id FROM driver_accumulators)
+        ORDER BY t.rowid
+    """, conn)
+    if not trips.empty:
+        _upsert_accumulators(conn, accumulate_driver_trips(trips))
+        _record_applied_trips(conn, trips)
+    return len(trips)
+
+def _upsert_accumulators(conn, deltas):
+    existing = pd.read_sql(
+        "SELECT a.driver_id, a.driver_seq FROM driver_accumulators a JOIN batch_drivers b USING (driver_id)", conn
+    ).set_index('driver_id')['driver_seq']
+    next_seq = conn.execute("SELECT COALESCE(MAX(driver_seq) + 1, 0) FROM driver_accumulators").fetchone()[0]
+
+    # New drivers are numbered in accumulate_driver_trips order (by smallest
+    # trip_id), the same order a full aggregate_driver_features run assigns
+    # their history in.
+    new_ids = deltas.index[~deltas.index.isin(existing.index)]
+    driver_seq = existing.reindex(deltas.index)
+    driver_seq[new_ids] = range(next_seq, next_seq + len(new_ids))
+
+    updates = ",\n".join(
+        f"{c} = MAX({c}, excluded.{c})" if c in MAX_ACCUMULATORS else f"{c} = {c} + excluded.{c}"
+        for c in ACCUMULATOR_COLUMNS
+    )
+    columns = ['driver_id', 'driver_seq'] + ACCUMULATOR_COLUMNS
+    conn.executemany(
+        f"""
+        INSERT INTO driver_accumulators ({", ".join(columns)})
+        VALUES ({", ".join("?" * len(columns))})
+        ON CONFLICT(driver_id) DO UPDATE SET
+        {updates}
+        """,
+        _rows(deltas.assign(driver_seq=driver_seq.astype('int64')).reset_index()[columns]),
+    )
+    return next_seq
+
+def _upsert_drivers(conn, drivers, history_columns):
+    columns = list(drivers.columns)
+    feature_columns = [c for c in columns if c != 'driver_id' and c not in history_columns]
+    updates = ",\n".join(f"{c} = excluded.{c}" for c in feature_columns)
+    conn.executemany(
+        f"""
+        INSERT INTO drivers ({", ".join(columns)})
+        VALUES ({", ".join("?" * len(columns))})
+        ON CONFLICT(driver_id) DO UPDATE SET
+        {updates}
+        """,
+        _rows(drivers),
+    )
+
+def update_driver_features(new_trips_df, db_file=DB_FILE, seed=42):
+    conn = sqlite3.connect(db_file)
+    try:
+        # Created up front: label_drivers runs inside the transaction below.
+        risk_normalization.create_normalization_tables(conn)
+        with conn:
+            create_accumulator_table(conn)
+            _stage_driver_ids(conn, new_trips_df['driver_id'].astype(str).unique())
+            seeded = _seed_accumulators(conn)
+            new_trips_df = _unapplied_trips(conn, new_trips_df)
+            if new_trips_df.empty:
+                print(f"✅ No new trips to apply ({seeded} existing trips seeded)")
+                return pd.DataFrame(columns=['driver_id'])
+            deltas = accumulate_driver_trips(new_trips_df)
+            _stage_driver_ids(conn, deltas.index)
+            first_new_seq = _upsert_accumulators(conn, deltas)
+            _record_applied_trips(conn, new_trips_df)
+            _upsert_trips(conn, new_trips_df)
+
+            acc = pd.read_sql(
+                "SELECT a.* FROM driver_accumulators a JOIN batch_drivers b USING (driver_id)", conn
+            ).set_index('driver_id').reindex(deltas.index)
+            drivers = derive_driver_features(acc)
+
+            # Simulated history is drawn once, when a driver is first seen, and
+            # never rewritten. A first batch into an empty store uses the plain
+            # seed so it reproduces aggregate_driver_features exactly.
+            new_seqs = acc['driver_seq'][acc['driver_seq'] >= first_new_seq]
+            history_seed = seed if first_new_seq == 0 else [seed, first_new_seq]
+            history = simulate_driver_history(len(new_seqs), seed=history_seed)
+            history.index = new_seqs.sort_values().index
+            drivers = pd.concat([drivers.set_index('driver_id'), history.reindex(acc.index)], axis=1).reset_index()
+            batch_sql = "SELECT d.* FROM drivers d JOIN batch_drivers b USING (driver_id)"
+            previous = pd.read_sql(batch_sql, conn)
+            _upsert_drivers(conn, drivers, set(history.columns))
+            # Existing drivers keep their stored history columns, so label from the table.
+            risk_normalization.label_drivers(conn, pd.read_sql(batch_sql, conn), previous)
+    finally:
+        conn.close()
+    print(f"✅ Updated {len(drivers)} drivers from {len(new_trips_df)} new trips")
+    score_store.refresh_driver_scores(db_file, driver_ids=drivers['driver_id'])
+    return drivers
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold a batch of new trips into the driver feature store")
+    parser.add_argument("trips_path", nargs="?", default=None, help="Defaults to the trips dataset for --storage")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--storage", choices=pipeline_storage.STORAGE_FORMATS, default="csv")
+    args = parser.parse_args()
+    update_driver_features(pipeline_storage.read_dataset("trips", args.storage, path=args.trips_path), db_file=args.db)
@@ -1,48 +1,160 @@
 import pandas as pd
 import numpy as np
+import argparse
+import pipeline_metrics
+import pipeline_storage
+from telemetry_schema import compact_trips
+
+HARSH_ACCEL_THRESHOLD = 3 * 2.23694
+IDLE_SPEED = 5
+DEFAULT_SAMPLE_INTERVAL_SEC = 5
+
+TRIP_ACCUMULATORS = {
+    'driver_id': 'first',
+    'samples': 'sum',
+    'time_sum': 'sum',
+    'miles_sum': 'sum',
+    'speed_sum': 'sum',
+    'max_speed': 'max',
+    'num_harsh_brakes': 'sum',
+    'num_harsh_accels': 'sum',
+    'idle_time': 'sum',
+    'night_samples': 'sum',
+    'urban_samples': 'sum',
+    'highway_samples': 'sum',
+}
+
+TRIP_FEATURE_COLUMNS = [
+    'trip_id', 'driver_id', 'trip_duration_min', 'total_miles', 'avg_speed', 'max_speed',
+    'num_harsh_brakes', 'num_harsh_accels', 'idling_pct', 'night_trip_pct', 'urban_pct', 'highway_pct',
+]
+
+def trip_row_features(telemetry_df, time_diff):
+    # Sensors are float32 in memory; trip features accumulate in float64.
+    speed = telemetry_df['speed'].astype(np.float64)
+    acceleration = telemetry_df['acceleration'].astype(np.float64)
+    hour = telemetry_df['timestamp'].dt.hour
+    road_type = telemetry_df['road_type']
+    return pd.DataFrame({
+        'trip_id': telemetry_df['trip_id'],
+        'driver_id': telemetry_df['driver_id'],
+        'samples': np.ones(len(telemetry_df), dtype=np.int64),
+        'time_sum': time_diff,
+        'miles_sum': speed * time_diff / 3600,
+        'speed_sum': speed,
+        'max_speed': speed,
+        'num_harsh_brakes': (acceleration < -HARSH_ACCEL_THRESHOLD).astype(np.int64),
+        'num_harsh_accels': (acceleration > HARSH_ACCEL_THRESHOLD).astype(np.int64),
+        'idle_time': time_diff.where((speed < IDLE_SPEED) & (telemetry_df['engine_on'] == 1), 0.0),
+        'night_samples': ((hour >= 22) | (hour < 5)).astype(np.int64),
+        'urban_samples': (road_type == 'city').astype(np.int64),
+        'highway_samples': (road_type == 'highway').astype(np.int64),
+    }, index=telemetry_df.index)
+
+def accumulate_trips(row_features):
+    return row_features.groupby('trip_id', sort=True, observed=True).agg(TRIP_ACCUMULATORS)
+
+def finalize_trip_features(trip_acc):
+    trips = pd.DataFrame({
+        'trip_id': trip_acc.index,
+        'driver_id': trip_acc['driver_id'].to_numpy(),
+        'trip_duration_min': (trip_acc['time_sum'] / 60).to_numpy(),
+        'total_miles': trip_acc['miles_sum'].to_numpy(),
+        'avg_speed': (trip_acc['speed_sum'] / trip_acc['samples']).to_numpy(),
+        'max_speed': trip_acc['max_speed'].to_numpy(),
+        'num_harsh_brakes': trip_acc['num_harsh_brakes'].to_numpy(),
+        'num_harsh_accels': trip_acc['num_harsh_accels'].to_numpy(),
+        'idling_pct': (trip_acc['idle_time'] / trip_acc['time_sum']).to_numpy(),
+        'night_trip_pct': (trip_acc['night_samples'] / trip_acc['samples']).to_numpy(),
+        'urban_pct': (trip_acc['urban_samples'] / trip_acc['samples']).to_numpy(),
+        'highway_pct': (trip_acc['highway_samples'] / trip_acc['samples']).to_numpy(),
+    })
+    return compact_trips(trips[TRIP_FEATURE_COLUMNS])
 
 def aggregate_trip_features(telemetry_df):
-    trip_features = []
-    telemetry_df = telemetry_df.sort_values(['trip_id', 'timestamp'])
-    telemetry_df['time_diff'] = telemetry_df.groupby('trip_id')['timestamp'].diff().dt.total_seconds().fillna(5)
-    
-    for trip_id, trip in telemetry_df.groupby('trip_id'):
-        driver_id = trip['driver_id'].iloc[0]
-        trip_duration_min = trip['time_diff'].sum() / 60
-        total_miles = (trip['speed'] * trip['time_diff'] / 3600).sum()
-        
-        avg_speed = trip['speed'].mean()
-        max_speed = trip['speed'].max()
-        
-        num_harsh_brakes = (trip['acceleration'] < -3 * 2.23694).sum()
-        num_harsh_accels = (trip['acceleration'] > 3 * 2.23694).sum()
-        
-        idling_time = trip[(trip['speed'] < 5) & (trip['engine_on'] == 1)]['time_diff'].sum()
-        idling_pct = idling_time / trip['time_diff'].sum()
-        
-        night_trip_pct = ((trip['timestamp'].dt.hour >= 22) | (trip['timestamp'].dt.hour < 5)).mean()
-        urban_pct = (trip['road_type'] == 'city').mean()
-        highway_pct = (trip['road_type'] == 'highway').mean()
-        
-        
-        trip_features.append({
-            'trip_id': trip_id,
-            'driver_id': driver_id,
-            'trip_duration_min': trip_duration_min,
-            'total_miles': total_miles,
-            'avg_speed': avg_speed,
-            'max_speed': max_speed,
-            'num_harsh_brakes': num_harsh_brakes,
-            'num_harsh_accels': num_harsh_accels,
-            'idling_pct': idling_pct,
-            'night_trip_pct': night_trip_pct,
-            'urban_pct': urban_pct,
-            'highway_pct': highway_pct,
-        })
-    return pd.DataFrame(trip_features)
+    with pipeline_metrics.span("sort", rows=len(telemetry_df)):
+        telemetry_df = telemetry_df.sort_values(['trip_id', 'timestamp'])
+    with pipeline_metrics.span("time_diff", rows=len(telemetry_df)):
+        time_diff = telemetry_df.groupby('trip_id', observed=True)['timestamp'].diff().dt.total_seconds().fillna(DEFAULT_SAMPLE_INTERVAL_SEC)
+    with pipeline_metrics.span("row_features", rows=len(telemetry_df)):
+        row_features = trip_row_features(telemetry_df, time_diff)
+    with pipeline_metrics.span("groupby", rows=len(row_features)):
+        trip_acc = accumulate_trips(row_features)
+    return finalize_trip_features(trip_acc)
+
+def merge_trip_accumulators(*trip_accs):
+    return pd.concat(trip_accs).groupby(level=0, sort=False, observed=True).agg(TRIP_ACCUMULATORS)
+
+def iter_trip_features(chunks):
+    # Chunks must arrive in file order with each trip's rows contiguous and
+    # time-ordered, as the simulator writes them. Only the trip that is still
+    # open at the end of a chunk is carried over to the next one; a trip that
+    # shows up again after it was closed would be emitted twice, so it raises.
+    # Only the open trip and the most recently closed one are remembered, so
+    # memory stays bounded by the chunk size.
+    open_acc = None
+    open_last_timestamp = None
+    last_closed = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        trip_ids = chunk['trip_id']
+        run_ids = trip_ids[trip_ids.ne(trip_ids.shift())]
+        reopened = set(run_ids[run_ids.duplicated()])
+        if open_acc is not None and (run_ids.iloc[1:] == open_acc.index[0]).any():
+            reopened.add(open_acc.index[0])
+        if last_closed is not None and (run_ids == last_closed).any():
+            reopened.add(last_closed)
+        if reopened:
+            raise ValueError(f"Telemetry rows for {sorted(map(str, reopened))[:5]} are not contiguous; sort by trip_id, timestamp first")
+        time_diff = chunk.groupby('trip_id', sort=False, observed=True)['timestamp'].diff().dt.total_seconds()
+        if open_acc is not None:
+            continues_open = (chunk['trip_id'] == open_acc.index[0]) & time_diff.isna()
+            time_diff[continues_open] = (chunk.loc[continues_open, 'timestamp'] - open_last_timestamp).dt.total_seconds()
+        time_diff = time_diff.fillna(DEFAULT_SAMPLE_INTERVAL_SEC)
+
+        trip_acc = trip_row_features(chunk, time_diff).groupby('trip_id', sort=False, observed=True).agg(TRIP_ACCUMULATORS)
+        if open_acc is not None:
+            trip_acc = merge_trip_accumulators(open_acc, trip_acc)
+
+        open_trip = chunk['trip_id'].iloc[-1]
+        open_last_timestamp = chunk['timestamp'].iloc[-1]
+        open_acc = trip_acc.loc[[open_trip]]
+        closed = trip_acc.drop(index=open_trip)
+        if not closed.empty:
+            last_closed = closed.index[-1]
+            yield finalize_trip_features(closed)
+
+    if open_acc is not None:
+        yield finalize_trip_features(open_acc)
+
+def aggregate_trip_features_chunked(path=None, chunksize=1_000_000, storage="csv"):
+    chunks = pipeline_storage.read_dataset("telemetry", storage, chunksize=chunksize, path=path)
+    yield from iter_trip_features(chunks)
 
 if __name__ == "__main__":
-    telemetry_df = pd.read_csv('telemetry_data.csv', parse_dates=['timestamp'])
-    trip_df = aggregate_trip_features(telemetry_df)
-    trip_df.to_csv('trip_data.csv', index=False)
-    print("Trip-level features saved to trip_data.csv")
+    parser = argparse.ArgumentParser(description="Aggregate telemetry into trip-level features")
+    parser.add_argument("--chunksize", type=int, default=None, help="Stream telemetry in chunks of this many rows")
+    parser.add_argument("--storage", choices=pipeline_storage.STORAGE_FORMATS, default="csv")
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure(args, "feature_extraction")
+
+    with pipeline_metrics.span("feature_extraction"):
+        if args.chunksize:
+            num_trips = 0
+            with pipeline_metrics.span("aggregate_chunked") as span:
+                for i, trips in enumerate(aggregate_trip_features_chunked(chunksize=args.chunksize, storage=args.storage)):
+                    path = pipeline_storage.write_dataset(trips, "trips", args.storage, part=i)
+                    num_trips += len(trips)
+                span.rows = num_trips
+            print(f"Trip-level features for {num_trips} trips streamed to {path}")
+        else:
+            with pipeline_metrics.span(f"read_{args.storage}") as span:
+                telemetry_df = pipeline_storage.read_dataset("telemetry", args.storage)
+                span.rows = len(telemetry_df)
+            with pipeline_metrics.span("aggregate_trip_features", rows=len(telemetry_df)):
+                trip_df = aggregate_trip_features(telemetry_df)
+            with pipeline_metrics.span(f"write_{args.storage}", rows=len(trip_df)):
+                path = pipeline_storage.write_dataset(trip_df, "trips", args.storage)
+            print(f"Trip-level features saved to {path}")
@@ -0,0 +1,141 @@
+import numpy as np
+import argparse
+import time
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+MAX_PRECISION = 12
+
+_BASE32_BYTES = np.frombuffer(BASE32.encode(), dtype=np.uint8)
+_DECODE_LUT = np.full(256, 255, dtype=np.uint8)
+_DECODE_LUT[_BASE32_BYTES] = np.arange(32, dtype=np.uint8)
+
+NEIGHBOR_OFFSETS = {
+    'n': (1, 0), 'ne': (1, 1), 'e': (0, 1), 'se': (-1, 1),
+    's': (-1, 0), 'sw': (-1, -1), 'w': (0, -1), 'nw': (1, -1),
+}
+
+def _check_precision(precision):
+    if isinstance(precision, bool) or not isinstance(precision, (int, np.integer)):
+        raise ValueError(f"Precision must be an integer, but got {type(precision).__name__}.")
+    if not 1 <= precision <= MAX_PRECISION:
+        raise ValueError(f"Precision must be between 1 and {MAX_PRECISION}, but got {precision}.")
+
+def _spread_bits(x):
+    x = x.astype(np.uint64)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x3333333333333333)
+    x = (x | (x << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return x
+
+def _cell_index(value, lo, hi, nbits):
+    # Quantize, then nudge by one cell where float rounding put the value on
+    # the wrong side of a boundary. Boundaries are exact dyadic fractions, so
+    # the result equals repeated bisection with value >= mid (as pygeohash).
+    cells = 1 << nbits
+    step = (hi - lo) / cells
+    index = np.floor((value - lo) / step).astype(np.int64)
+    np.clip(index, 0, cells - 1, out=index)
+    index -= value < lo + index * step
+    index += (index < cells - 1) & (value >= lo + (index + 1) * step)
+    return index
+
+def encode_bits(lat, lon, precision):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if not (np.all((lat >= -90.0) & (lat <= 90.0)) and np.all((lon >= -180.0) & (lon <= 180.0))):
+        raise ValueError("Latitude must be within [-90, 90] and longitude within [-180, 180] (NaN is not allowed).")
+
+    # Bits alternate lon, lat, lon, ... starting from the most significant one.
+    nbits = 5 * precision
+    lon_bits = (nbits + 1) // 2
+    lat_bits = nbits // 2
+    lon_index = _spread_bits(_cell_index(lon, -180.0, 180.0, lon_bits))
+    lat_index = _spread_bits(_cell_index(lat, -90.0, 90.0, lat_bits))
+    if nbits % 2 == 0:
+        return (lon_index << np.uint64(1)) | lat_index
+    return lon_index | (lat_index << np.uint64(1))
+
+def encode(lat, lon, precision=MAX_PRECISION):
+    _check_precision(precision)
+    bits = encode_bits(lat, lon, precision)
+    shifts = np.arange(precision - 1, -1, -1, dtype=np.uint64) * np.uint64(5)
+    digits = (bits.reshape(-1, 1) >> shifts) & np.uint64(31)
+    chars = _BASE32_BYTES[digits.astype(np.intp)]
+    return np.array(chars.view(f'S{precision}').ravel().astype(f'U{precision}').tolist(), dtype=object).reshape(bits.shape)
+
+def decode_exactly(hashes):
+    hashes = np.asarray(hashes, dtype=object)
+    precision = len(hashes.flat[0]) if hashes.size else 1
+    raw = hashes.astype(f'S{precision}')
+    chars = np.frombuffer(raw.tobytes(), dtype=np.uint8).reshape(-1, precision)
+    digits = _DECODE_LUT[chars]
+    if (digits == 255).any() or any(len(h) != precision for h in hashes.flat):
+        raise ValueError("Geohashes must be non-empty, use the geohash base32 alphabet and share one precision.")
+
+    n = len(digits)
+    lat_lo, lat_hi = np.full(n, -90.0), np.full(n, 90.0)
+    lon_lo, lon_hi = np.full(n, -180.0), np.full(n, 180.0)
+    i = 0
+    for c in range(precision):
+        for b in range(4, -1, -1):
+            upper = ((digits[:, c] >> b) & 1).astype(bool)
+            lo, hi = (lon_lo, lon_hi) if i % 2 == 0 else (lat_lo, lat_hi)
+            mid = (lo + hi) / 2
+            np.copyto(lo, mid, where=upper)
+            np.copyto(hi, mid, where=~upper)
+            i += 1
+    shape = hashes.shape
+    return (
+        ((lat_lo + lat_hi) / 2).reshape(shape),
+        ((lon_lo + lon_hi) / 2).reshape(shape),
+        ((lat_hi - lat_lo) / 2).reshape(shape),
+        ((lon_hi - lon_lo) / 2).reshape(shape),
+    )
+
+def decode(hashes):
+    lat, lon, _, _ = decode_exactly(hashes)
+    return lat, lon
+
+def neighbors(hashes):
+    hashes = np.asarray(hashes, dtype=object)
+    precision = len(hashes.flat[0]) if hashes.size else 1
+    lat, lon, lat_err, lon_err = decode_exactly(hashes)
+    result = {}
+    for direction, (dlat, dlon) in NEIGHBOR_OFFSETS.items():
+        n_lat = np.clip(lat + 2 * dlat * lat_err, -90.0, 90.0)
+        n_lon = (lon + 2 * dlon * lon_err + 180.0) % 360.0 - 180.0
+        result[direction] = encode(n_lat, n_lon, precision)
+    return result
+
+if __name__ == "__main__":
+    import pandas as pd
+    import pygeohash as pgh
+
+    parser = argparse.ArgumentParser(description="Benchmark vectorized geohash encoding against pygeohash")
+    parser.add_argument("--points", type=int, default=10_000_000)
+    parser.add_argument("--precision", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(36.5, 45.0, args.points)
+    lon = rng.uniform(-94.0, -81.0, args.points)
+
+    start = time.perf_counter()
+    fast = encode(lat, lon, args.precision)
+    fast_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = [pgh.encode(float(a), float(o), precision=args.precision) for a, o in zip(lat, lon)]
+    reference_sec = time.perf_counter() - start
+
+    df = pd.DataFrame({"lat": lat, "lon": lon})
+    start = time.perf_counter()
+    df.apply(lambda r: pgh.encode(float(r["lat"]), float(r["lon"]), precision=args.precision), axis=1)
+    apply_sec = time.perf_counter() - start
+
+    mismatches = int((fast != np.array(reference, dtype=object)).sum())
+    print(f"{args.points:,} points at precision {args.precision}, mismatches vs pygeohash: {mismatches}")
+    for name, sec in [("DataFrame.apply", apply_sec), ("pygeohash loop", reference_sec), ("vectorized", fast_sec)]:
+        print(f"{name:<16}: {sec:8.2f}s ({args.points / sec:>12,.0f} points/s, {apply_sec / sec:6.1f}x vs apply)")
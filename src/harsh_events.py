@@ -0,0 +1,93 @@
+import pandas as pd
+import numpy as np
+
+# Looser than feature_extraction.HARSH_ACCEL_THRESHOLD so both the dashboard
+# charts (|a| > 4) and trip features (|a| > 6.71) can be answered from the
+# stored magnitudes.
+HARSH_EVENT_THRESHOLD = 4
+
+def create_harsh_event_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS harsh_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TIMESTAMP,
+            trip_id TEXT,
+            driver_id TEXT,
+            event_type TEXT,
+            magnitude REAL
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_harsh_events_driver_ts ON harsh_events (driver_id, timestamp)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS harsh_event_daily (
+            driver_id TEXT,
+            day TEXT,
+            harsh_brakes INTEGER,
+            harsh_accels INTEGER,
+            PRIMARY KEY (driver_id, day)
+        ) WITHOUT ROWID;
+    """)
+    conn.commit()
+
+def extract_harsh_events(telemetry_df, threshold=HARSH_EVENT_THRESHOLD):
+    acceleration = telemetry_df["acceleration"].to_numpy()
+    harsh = np.abs(acceleration) > threshold
+    events = telemetry_df.loc[harsh, ["timestamp", "trip_id", "driver_id"]].copy()
+    events["timestamp"] = pd.to_datetime(events["timestamp"])
+    events["event_type"] = np.where(acceleration[harsh] < 0, "harsh_brake", "harsh_accel")
+    events["magnitude"] = np.abs(acceleration[harsh])
+    return events.reset_index(drop=True)
+
+def daily_rollup(events):
+    counts = events.assign(day=events["timestamp"].dt.strftime("%Y-%m-%d"))
+    counts = counts.groupby(["driver_id", "day", "event_type"], observed=True).size().unstack("event_type", fill_value=0)
+    counts = counts.reindex(columns=["harsh_brake", "harsh_accel"], fill_value=0)
+    counts.columns = ["harsh_brakes", "harsh_accels"]
+    return counts.reset_index()
+
+def record_harsh_events(conn, telemetry_df, threshold=HARSH_EVENT_THRESHOLD):
+    events = extract_harsh_events(telemetry_df, threshold)
+    if events.empty:
+        return 0
+    conn.executemany(
+        "INSERT INTO harsh_events (timestamp, trip_id, driver_id, event_type, magnitude) VALUES (?, ?, ?, ?, ?)",
+        zip(
+            events["timestamp"].astype(str),
+            events["trip_id"].tolist(),
+            events["driver_id"].tolist(),
+            events["event_type"].tolist(),
+            events["magnitude"].tolist(),
+        ),
+    )
+    rollup = daily_rollup(events)
+    conn.executemany(
+        """
+        INSERT INTO harsh_event_daily (driver_id, day, harsh_brakes, harsh_accels)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(driver_id, day) DO UPDATE SET
+            harsh_brakes = harsh_brakes + excluded.harsh_brakes,
+            harsh_accels = harsh_accels + excluded.harsh_accels
+        """,
+        rollup[["driver_id", "day", "harsh_brakes", "harsh_accels"]].to_numpy(dtype=object).tolist(),
+    )
+    return len(events)
+
+def remove_harsh_events(conn, telemetry_df, threshold=HARSH_EVENT_THRESHOLD):
+    # Takes back what record_harsh_events added for these (previously loaded)
+    # telemetry rows, e.g. before their trips are reloaded.
+    trip_ids = telemetry_df["trip_id"].astype(str).unique()
+    conn.executemany("DELETE FROM harsh_events WHERE trip_id = ?", [(t,) for t in trip_ids])
+    events = extract_harsh_events(telemetry_df, threshold)
+    if events.empty:
+        return 0
+    rollup = daily_rollup(events)
+    conn.executemany(
+        """
+        UPDATE harsh_event_daily
+        SET harsh_brakes = harsh_brakes - ?, harsh_accels = harsh_accels - ?
+        WHERE driver_id = ? AND day = ?
+        """,
+        rollup[["harsh_brakes", "harsh_accels", "driver_id", "day"]].to_numpy(dtype=object).tolist(),
+    )
+    conn.execute("DELETE FROM harsh_event_daily WHERE harsh_brakes <= 0 AND harsh_accels <= 0")
+    return len(events)
@@ -1,19 +1,41 @@
 import sqlite3
 import pandas as pd
-import pygeohash as pgh
 from cryptography.fernet import Fernet
 import os
+import geohash_codec
+import coordinate_blocks
+import harsh_events
+import speed_histogram
+import score_store
+import risk_normalization
+import pipeline_metrics
+import pipeline_storage
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 SCHEMA_FILE = "schema.sql"
 DB_FILE = "telematics.db"
 
-DRIVER_CSV = "driver_data.csv"
-TRIP_CSV = "trip_data.csv"
-TELEMETRY_CSV = "telemetry_data.csv"
-
 KEY_FILE = "secret.key"
 GEOHASH_PRECISION = 5 
 
+BULK_BATCH_ROWS = 50_000
+BULK_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -262144,
+    "temp_store": "MEMORY",
+}
+
+# driver/timestamp-leading index covers the dashboards' per-driver and
+# per-day telemetry queries without touching the table rows.
+SECONDARY_INDEXES = {
+    "idx_telemetry_driver_ts": "CREATE INDEX IF NOT EXISTS idx_telemetry_driver_ts ON telemetry_secure (driver_id, timestamp, speed, acceleration)",
+    "idx_telemetry_trip_ts": "CREATE INDEX IF NOT EXISTS idx_telemetry_trip_ts ON telemetry_secure (trip_id, timestamp)",
+    "idx_trips_driver": "CREATE INDEX IF NOT EXISTS idx_trips_driver ON trips (driver_id)",
+}
+
 def load_key(key_file):
     if not os.path.exists(key_file):
         raise FileNotFoundError(f"Key file {key_file} not found. Generate with gen_key.py")
@@ -29,93 +51,332 @@ def create_db(schema_file=SCHEMA_FILE, db_file=DB_FILE):
     conn.close()
     print("✅ Database created with schema:", db_file)
 
-def insert_drivers(csv_path=DRIVER_CSV, db_file=DB_FILE):
-    df = pd.read_csv(csv_path)
+def insert_drivers(path=None, db_file=DB_FILE, storage="csv"):
+    df = pipeline_storage.read_dataset("drivers", storage, path=path)
     if "driver_id" not in df.columns:
-        raise ValueError("driver_data.csv must have 'driver_id'")
+        raise ValueError("driver data must have 'driver_id'")
     conn = sqlite3.connect(db_file)
-    df.to_sql("drivers", conn, if_exists="append", index=False)
-    conn.commit()
+    with pipeline_metrics.span("to_sql", rows=len(df)):
+        df.to_sql("drivers", conn, if_exists="append", index=False)
+        conn.commit()
     conn.close()
     print(f"✅ Inserted {len(df)} rows into 'drivers'")
+    with pipeline_metrics.span("risk_rebase", rows=len(df)):
+        risk_normalization.rebase(db_file)
+    with pipeline_metrics.span("refresh_scores", rows=len(df)):
+        score_store.refresh_driver_scores(db_file)
 
-def insert_trips(csv_path=TRIP_CSV, db_file=DB_FILE):
-    df = pd.read_csv(csv_path)
+def insert_trips(path=None, db_file=DB_FILE, storage="csv"):
+    df = pipeline_storage.read_dataset("trips", storage, path=path)
     if "trip_id" not in df.columns:
-        raise ValueError("trip_data.csv must have 'trip_id'")
+        raise ValueError("trip data must have 'trip_id'")
     conn = sqlite3.connect(db_file)
-    df.to_sql("trips", conn, if_exists="append", index=False)
-    conn.commit()
+    with pipeline_metrics.span("to_sql", rows=len(df)):
+        df.to_sql("trips", conn, if_exists="append", index=False)
+        conn.commit()
     conn.close()
     print(f"✅ Inserted {len(df)} rows into 'trips'")
 
-def encrypt_and_insert_telemetry(csv_path=TELEMETRY_CSV, db_file=DB_FILE, key_file=KEY_FILE):
-    key = load_key(key_file)
-    f = Fernet(key)
+TELEMETRY_COLUMNS = {"timestamp","trip_id","driver_id","lat","lon","speed","acceleration","road_type","engine_on"}
 
-    df = pd.read_csv(csv_path, parse_dates=["timestamp"])
-    required = {"timestamp","trip_id","driver_id","lat","lon","speed","acceleration","road_type","engine_on"}
-    missing = required - set(df.columns)
+def create_telemetry_secure_table(conn):
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS telemetry_secure (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TIMESTAMP,
+            trip_id TEXT,
+            driver_id TEXT,
+            lat TEXT,
+            lon TEXT,
+            speed REAL,
+            acceleration REAL,
+            road_type TEXT,
+            engine_on INTEGER,
+            geohash TEXT,
+            coord_index INTEGER
+        );
+    """)
+    conn.commit()
+    harsh_events.create_harsh_event_tables(conn)
+    speed_histogram.create_speed_histogram_table(conn)
+
+def check_telemetry_columns(df):
+    missing = TELEMETRY_COLUMNS - set(df.columns)
     if missing:
         raise ValueError("Telemetry CSV missing columns: " + ", ".join(missing))
 
-    df["geohash"] = df.apply(lambda r: pgh.encode(float(r["lat"]), float(r["lon"]), precision=GEOHASH_PRECISION), axis=1)
+def encrypt_telemetry(df, f):
+    df = df.copy()
+    with pipeline_metrics.span("geohash", rows=len(df)):
+        df["geohash"] = geohash_codec.encode(df["lat"].to_numpy(dtype=float), df["lon"].to_numpy(dtype=float), GEOHASH_PRECISION)
 
     def enc_val(x):
         if pd.isna(x):
             return None
         return f.encrypt(str(x).encode()).decode()
 
-    df["lat_enc"] = df["lat"].apply(enc_val)
-    df["lon_enc"] = df["lon"].apply(enc_val)
+    with pipeline_metrics.span("encrypt", rows=len(df)):
+        df["lat_enc"] = df["lat"].apply(enc_val)
+        df["lon_enc"] = df["lon"].apply(enc_val)
 
     insert_df = df[[
         "timestamp","trip_id","driver_id","lat_enc","lon_enc",
         "speed","acceleration","road_type","engine_on","geohash"
     ]].copy()
 
-    insert_df = insert_df.rename(columns={"lat_enc":"lat","lon_enc":"lon"})
+    return insert_df.rename(columns={"lat_enc":"lat","lon_enc":"lon"})
+
+def encrypt_chunk(key, chunk):
+    return encrypt_telemetry(chunk, Fernet(key))
+
+def encrypt_and_insert_telemetry(path=None, db_file=DB_FILE, key_file=KEY_FILE, storage="csv"):
+    key = load_key(key_file)
+    f = Fernet(key)
+
+    with pipeline_metrics.span(f"read_{storage}") as span:
+        df = pipeline_storage.read_dataset("telemetry", storage, path=path)
+        span.rows = len(df)
+    check_telemetry_columns(df)
+    insert_df = encrypt_telemetry(df, f)
 
     conn = sqlite3.connect(db_file)
-    cur = conn.cursor()
+    create_telemetry_secure_table(conn)
 
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS telemetry_secure (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TIMESTAMP,
-            trip_id TEXT,
-            driver_id TEXT,
-            lat TEXT,
-            lon TEXT,
-            speed REAL,
-            acceleration REAL,
-            road_type TEXT,
-            engine_on INTEGER,
-            geohash TEXT
-        );
-    """)
-    conn.commit()
+    # Rows and the tables derived from them commit together.
+    with conn:
+        with pipeline_metrics.span("insert_rows", rows=len(insert_df)):
+            insert_rows(conn, "telemetry_secure", insert_df)
+        with pipeline_metrics.span("harsh_events", rows=len(insert_df)):
+            num_events = harsh_events.record_harsh_events(conn, insert_df)
+        with pipeline_metrics.span("speed_histogram", rows=len(insert_df)):
+            speed_histogram.record_speed_histogram(conn, insert_df)
+    conn.close()
+    print(f"✅ Inserted {len(insert_df)} rows into 'telemetry_secure' and {num_events} harsh events")
+
+def encrypt_and_insert_telemetry_parallel(path=None, db_file=DB_FILE, key_file=KEY_FILE,
+                                          chunksize=100_000, workers=None, storage="csv"):
+    key = load_key(key_file)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+
+    conn = sqlite3.connect(db_file)
+    create_telemetry_secure_table(conn)
+
+    def write(future):
+        # Geohash/encryption run in the workers; here we only see the wait.
+        with pipeline_metrics.span("wait_encrypt") as span:
+            insert_df = future.result()
+            span.rows = len(insert_df)
+        with conn:
+            with pipeline_metrics.span("insert_rows", rows=len(insert_df)):
+                insert_rows(conn, "telemetry_secure", insert_df)
+            with pipeline_metrics.span("harsh_events", rows=len(insert_df)):
+                harsh_events.record_harsh_events(conn, insert_df)
+            with pipeline_metrics.span("speed_histogram", rows=len(insert_df)):
+                speed_histogram.record_speed_histogram(conn, insert_df)
+        return len(insert_df)
+
+    # Chunks are written in read order while later chunks are still being
+    # encrypted; at most max_in_flight chunks are held in memory at once.
+    total = 0
+    in_flight = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=pipeline_metrics.disable) as pool:
+            for chunk in pipeline_storage.read_dataset("telemetry", storage, chunksize=chunksize, path=path):
+                check_telemetry_columns(chunk)
+                if len(in_flight) >= max_in_flight:
+                    total += write(in_flight.popleft())
+                in_flight.append(pool.submit(encrypt_chunk, key, chunk))
+            while in_flight:
+                total += write(in_flight.popleft())
+    finally:
+        conn.close()
+    print(f"✅ Inserted {total} rows into 'telemetry_secure' using {workers} workers")
+
+def encrypt_and_insert_telemetry_blocks(path=None, db_file=DB_FILE, key_file=KEY_FILE, dtype="float64", storage="csv"):
+    key = load_key(key_file)
+    f = Fernet(key)
 
-    insert_df.to_sql("telemetry_secure", conn, if_exists="append", index=False)
+    with pipeline_metrics.span(f"read_{storage}") as span:
+        df = pipeline_storage.read_dataset("telemetry", storage, path=path)
+        span.rows = len(df)
+    check_telemetry_columns(df)
+    df = df.sort_values(["trip_id", "timestamp"], kind="stable")
+    df["coord_index"] = coordinate_blocks.coordinate_index(df)
+    with pipeline_metrics.span("geohash", rows=len(df)):
+        df["geohash"] = geohash_codec.encode(df["lat"].to_numpy(dtype=float), df["lon"].to_numpy(dtype=float), GEOHASH_PRECISION)
+
+    # Coordinates live only in the per-trip encrypted blocks; the row table
+    # keeps lat/lon NULL and points into its trip's block with coord_index.
+    insert_df = df[[
+        "timestamp","trip_id","driver_id","speed","acceleration","road_type","engine_on","geohash","coord_index"
+    ]]
+
+    conn = sqlite3.connect(db_file)
+    create_telemetry_secure_table(conn)
+    coordinate_blocks.create_coordinate_blocks_table(conn)
+    with conn:
+        # A reloaded trip's block is replaced, so its old rows go with it,
+        # along with what they added to the derived tables.
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_trips (trip_id TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM batch_trips")
+        conn.executemany("INSERT INTO batch_trips (trip_id) VALUES (?)", [(t,) for t in df["trip_id"].astype(str).unique()])
+        reloaded = pd.read_sql(
+            "SELECT timestamp, trip_id, driver_id, speed, acceleration FROM telemetry_secure "
+            "WHERE trip_id IN (SELECT trip_id FROM batch_trips)", conn,
+        )
+        if not reloaded.empty:
+            harsh_events.remove_harsh_events(conn, reloaded)
+            speed_histogram.remove_speed_histogram(conn, reloaded)
+        conn.execute("DELETE FROM telemetry_secure WHERE trip_id IN (SELECT trip_id FROM batch_trips)")
+        with pipeline_metrics.span("insert_rows", rows=len(insert_df)):
+            insert_rows(conn, "telemetry_secure", insert_df)
+        with pipeline_metrics.span("harsh_events", rows=len(insert_df)):
+            harsh_events.record_harsh_events(conn, insert_df)
+        with pipeline_metrics.span("speed_histogram", rows=len(insert_df)):
+            speed_histogram.record_speed_histogram(conn, insert_df)
+        with pipeline_metrics.span("encrypt_blocks", rows=len(df)):
+            num_blocks = coordinate_blocks.insert_coordinate_blocks(df, conn, f, dtype=dtype)
+    conn.close()
+    print(f"✅ Inserted {len(insert_df)} rows into 'telemetry_secure' and {num_blocks} trip blocks into 'telemetry_coord_blocks'")
+
+def connect_bulk(db_file=DB_FILE):
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    for pragma, value in BULK_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma}={value}")
+    return conn
+
+def drop_secondary_indexes(conn):
+    for name in SECONDARY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+def create_secondary_indexes(conn):
+    for ddl in SECONDARY_INDEXES.values():
+        conn.execute(ddl)
+    conn.execute("ANALYZE")
     conn.commit()
+
+def _column_values(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.astype(str).where(series.notna(), None)
+    values = series.tolist()
+    if series.hasnans:
+        values = [None if pd.isna(v) else v for v in values]
+    return values
+
+def insert_rows(conn, table, df, batch_rows=BULK_BATCH_ROWS):
+    # executemany inside the caller's transaction; to_sql would commit on its own.
+    columns = list(df.columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows]
+        conn.executemany(sql, zip(*(_column_values(batch[col]) for col in columns)))
+    return len(df)
+
+def bulk_insert(conn, table, df, batch_rows=BULK_BATCH_ROWS):
+    for start in range(0, len(df), batch_rows):
+        conn.execute("BEGIN")
+        try:
+            insert_rows(conn, table, df.iloc[start:start + batch_rows], batch_rows)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    return len(df)
+
+def bulk_load(db_file=DB_FILE, schema_file=SCHEMA_FILE, key_file=KEY_FILE, batch_rows=BULK_BATCH_ROWS, storage="csv"):
+    create_db(schema_file, db_file)
+    conn = connect_bulk(db_file)
+    create_telemetry_secure_table(conn)
+    drop_secondary_indexes(conn)
+
+    for table in ["drivers", "trips"]:
+        if pipeline_storage.dataset_exists(table, storage):
+            with pipeline_metrics.span(f"insert_{table}") as span:
+                rows = span.rows = bulk_insert(conn, table, pipeline_storage.read_dataset(table, storage), batch_rows)
+            print(f"✅ Inserted {rows} rows into '{table}'")
+        else:
+            print(f"⚠️ {pipeline_storage.dataset_path(table, storage)} not found")
+
+    if pipeline_storage.dataset_exists("telemetry", storage):
+        with pipeline_metrics.span("telemetry") as span:
+            f = Fernet(load_key(key_file))
+            rows = 0
+            for chunk in pipeline_storage.read_dataset("telemetry", storage, chunksize=batch_rows):
+                check_telemetry_columns(chunk)
+                insert_df = encrypt_telemetry(chunk, f)
+                # A chunk's rows and the tables derived from them commit together.
+                conn.execute("BEGIN")
+                try:
+                    with pipeline_metrics.span("executemany", rows=len(insert_df)):
+                        rows += insert_rows(conn, "telemetry_secure", insert_df, batch_rows)
+                    with pipeline_metrics.span("derived_tables", rows=len(chunk)):
+                        harsh_events.record_harsh_events(conn, chunk)
+                        speed_histogram.record_speed_histogram(conn, chunk)
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            span.rows = rows
+        print(f"✅ Inserted {rows} rows into 'telemetry_secure'")
+    else:
+        print(f"⚠️ {pipeline_storage.dataset_path('telemetry', storage)} not found")
+
+    with pipeline_metrics.span("create_indexes"):
+        create_secondary_indexes(conn)
     conn.close()
-    print(f"✅ Inserted {len(insert_df)} rows into 'telemetry_secure'")
+    print("✅ Secondary indexes built")
+    with pipeline_metrics.span("risk_rebase"):
+        risk_normalization.rebase(db_file)
+    with pipeline_metrics.span("refresh_scores"):
+        score_store.refresh_driver_scores(db_file)
 
-def main():
+def main(workers=None, coord_blocks=False, bulk=False, storage="csv"):
+    if bulk:
+        bulk_load(storage=storage)
+        return
     create_db()
-    if os.path.exists(DRIVER_CSV):
-        insert_drivers()
+    if pipeline_storage.dataset_exists("drivers", storage):
+        with pipeline_metrics.span("drivers"):
+            insert_drivers(storage=storage)
     else:
-        print("⚠️ driver_data.csv not found")
-    if os.path.exists(TRIP_CSV):
-        insert_trips()
+        print(f"⚠️ {pipeline_storage.dataset_path('drivers', storage)} not found")
+    if pipeline_storage.dataset_exists("trips", storage):
+        with pipeline_metrics.span("trips"):
+            insert_trips(storage=storage)
     else:
-        print("⚠️ trip_data.csv not found")
+        print(f"⚠️ {pipeline_storage.dataset_path('trips', storage)} not found")
 
-    if os.path.exists(TELEMETRY_CSV):
-        encrypt_and_insert_telemetry()
+    if pipeline_storage.dataset_exists("telemetry", storage):
+        with pipeline_metrics.span("telemetry"):
+            if coord_blocks:
+                encrypt_and_insert_telemetry_blocks(storage=storage)
+            elif workers:
+                encrypt_and_insert_telemetry_parallel(workers=workers, storage=storage)
+            else:
+                encrypt_and_insert_telemetry(storage=storage)
     else:
-        print("⚠️ telemetry.csv not found")
+        print(f"⚠️ {pipeline_storage.dataset_path('telemetry', storage)} not found")
+
+    conn = sqlite3.connect(DB_FILE)
+    create_telemetry_secure_table(conn)
+    with pipeline_metrics.span("create_indexes"):
+        create_secondary_indexes(conn)
+    conn.close()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Load telematics CSVs into SQLite")
+    parser.add_argument("--workers", type=int, default=None, help="Encrypt telemetry in parallel chunks")
+    parser.add_argument("--coord-blocks", action="store_true", help="Store coordinates as one encrypted block per trip")
+    parser.add_argument("--bulk", action="store_true", help="WAL + batched executemany load, indexes built afterwards")
+    parser.add_argument("--storage", choices=pipeline_storage.STORAGE_FORMATS, default="csv", help="Read the hand-off datasets as CSV or partitioned Parquet")
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    if args.bulk and (args.workers or args.coord_blocks):
+        parser.error("--bulk can't be combined with --workers or --coord-blocks")
+    if args.workers and args.coord_blocks:
+        parser.error("--coord-blocks can't be combined with --workers")
+    pipeline_metrics.configure(args, "load_db")
+    with pipeline_metrics.span("load_db"):
+        main(workers=args.workers, coord_blocks=args.coord_blocks, bulk=args.bulk, storage=args.storage)
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import platform
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from cryptography.fernet import Fernet
+from telematics_simulator import simulate_telemetry_df
+from feature_extraction import aggregate_trip_features
+from Driver_features import aggregate_driver_features
+from load_db import encrypt_and_insert_telemetry
+from pipeline_metrics import PeakRSS
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Dashboard"))
+import data_access
+
+RESULTS_FILE = "benchmark_results.json"
+BASELINE_FILE = "benchmark_baseline.json"
+SCALES = {"10k": 10_000, "1M": 1_000_000, "10M": 10_000_000}
+DEFAULT_SCALES = ["10k", "1M"]
+TRIPS_PER_DRIVER = 10
+# Trips last 1-60 min sampled every 5 s, so ~366 rows per trip on average.
+AVG_ROWS_PER_TRIP = 366
+REGRESSION_THRESHOLD = 0.20
+DEFAULT_REPEATS = 3
+# Stages below these floors are too short/small for ratios to mean anything,
+# and a regression must also grow by at least the floor itself.
+NOISE_FLOOR = {"seconds": 0.25, "rss_growth_mb": 16}
+# Timings are compared on the fastest repeat, which is the least noisy.
+COMPARED = {"seconds": "seconds_min", "rss_growth_mb": "rss_growth_mb"}
+DASHBOARD_SAMPLE_DRIVERS = 5
+
+def measure(fn, repeats=DEFAULT_REPEATS):
+    timings, peaks, deltas = [], [], []
+    for _ in range(repeats):
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+        peaks.append(rss.peak / 2**20)
+        deltas.append((rss.peak - rss.start) / 2**20)
+    return result, {
+        "seconds": float(np.median(timings)),
+        "seconds_min": min(timings),
+        "peak_rss_mb": max(peaks),
+        "rss_growth_mb": max(deltas),
+    }
+
+DASHBOARD_LOADERS = [
+    data_access.load_drivers,
+    data_access._load_driver_scores,
+    data_access.load_driver_trips,
+    data_access.load_driver_daily_harsh_events,
+    data_access.load_driver_speed_histogram,
+]
+
+def dashboard_load(db_file, driver_ids):
+    # The loaders a dashboard session calls: drivers and scores, then trips,
+    # daily harsh events and the speed histogram for each selected driver.
+    # Caches are cleared first so every repeat measures a cold session.
+    data_access.DB_FILE = os.path.abspath(db_file)
+    for loader in DASHBOARD_LOADERS:
+        loader.clear()
+    data_access.load_drivers()
+    data_access.load_driver_scores()
+    for driver_id in driver_ids:
+        data_access.load_driver_trips(driver_id)
+        data_access.load_driver_daily_harsh_events(driver_id)
+        data_access.load_driver_speed_histogram(driver_id)
+    return len(driver_ids)
+
+def run_scale(rows, workdir, repeats=DEFAULT_REPEATS, model_path=None):
+    num_drivers = max(1, round(rows / (TRIPS_PER_DRIVER * AVG_ROWS_PER_TRIP)))
+    stages = {}
+
+    telemetry, stages["simulate"] = measure(lambda: simulate_telemetry_df(num_drivers, TRIPS_PER_DRIVER, seed=0), repeats)
+    stages["simulate"]["rows"] = len(telemetry)
+    trips, stages["trip_features"] = measure(lambda: aggregate_trip_features(telemetry), repeats)
+    stages["trip_features"]["rows"] = len(telemetry)
+    drivers, stages["driver_features"] = measure(lambda: aggregate_driver_features(trips), repeats)
+    stages["driver_features"]["rows"] = len(trips)
+
+    csv_path = os.path.join(workdir, "telemetry_data.csv")
+    key_file = os.path.join(workdir, "secret.key")
+    telemetry.to_csv(csv_path, index=False)
+    key = Fernet.generate_key()
+    with open(key_file, "wb") as f:
+        f.write(key)
+
+    db_files = []
+    def load():
+        db_files.append(os.path.join(workdir, f"bench_{len(db_files)}.db"))
+        encrypt_and_insert_telemetry(csv_path, db_files[-1], key_file)
+    _, stages["encrypt_and_insert"] = measure(load, repeats)
+    stages["encrypt_and_insert"]["rows"] = len(telemetry)
+
+    db_file = db_files[-1]
+    with sqlite3.connect(db_file) as conn:
+        drivers.to_sql("drivers", conn, index=False, if_exists="replace")
+        trips.to_sql("trips", conn, index=False, if_exists="replace")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bench_trips_driver ON trips (driver_id)")
+    sample = drivers["driver_id"].head(DASHBOARD_SAMPLE_DRIVERS).tolist()
+    _, stages["dashboard_load"] = measure(lambda: dashboard_load(db_file, sample), repeats)
+    stages["dashboard_load"]["rows"] = len(sample)
+
+    if model_path and os.path.exists(model_path):
+        import joblib
+        model = joblib.load(model_path)
+        features = drivers.drop(columns=["driver_id"]).fillna(0)
+        _, stages["model_predict"] = measure(lambda: model.predict(features), repeats)
+        stages["model_predict"]["rows"] = len(features)
+    else:
+        print(f"⚠️ {model_path} not found, skipping model_predict")
+
+    for path in db_files + [csv_path]:
+        os.remove(path)
+    return {"telemetry_rows": len(telemetry), "drivers": num_drivers, "stages": stages}
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for scale, run in results["scales"].items():
+        base_run = baseline.get("scales", {}).get(scale)
+        if not base_run:
+            continue
+        for stage, metrics in run["stages"].items():
+            base = base_run["stages"].get(stage)
+            if not base:
+                continue
+            for metric, floor in NOISE_FLOOR.items():
+                key = COMPARED[metric] if COMPARED[metric] in base else metric
+                old, new = base[key], metrics[key]
+                if max(old, new) >= floor and new > max(old, floor) * (1 + threshold) and new - old >= floor:
+                    regressions.append((scale, stage, key, old, new))
+    return regressions
+
+def print_results(results, baseline=None):
+    for scale, run in results["scales"].items():
+        print(f"=== {scale}: {run['telemetry_rows']:,} telemetry rows, {run['drivers']} drivers ===")
+        base_run = (baseline or {}).get("scales", {}).get(scale, {}).get("stages", {})
+        for stage, m in run["stages"].items():
+            base = base_run.get(stage)
+            change = f"  ({m['seconds'] / base['seconds'] - 1:+.0%} vs baseline)" if base and base["seconds"] > 0 else ""
+            print(f"  {stage:<20} {m['seconds']:9.3f}s  RSS +{m['rss_growth_mb']:7.1f} MB (peak {m['peak_rss_mb']:7.1f})  "
+                  f"{m['rows'] / m['seconds'] if m['seconds'] else 0:>12,.0f} rows/s{change}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark simulate -> trips -> drivers -> DB -> dashboard -> score")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=DEFAULT_SCALES)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--model", default="stacking_model.pkl")
+    parser.add_argument("--out", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed slowdown before flagging, e.g. 0.2 = 20%%")
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the new baseline")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "scales": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            results["scales"][scale] = run_scale(SCALES[scale], workdir, args.repeats, args.model)
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"✅ Results written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Saved as baseline {args.baseline}")
+    elif baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for scale, stage, metric, old, new in regressions:
+            change = f"{new / old - 1:+.0%}" if old else "new"
+            print(f"⚠️ Regression {scale}/{stage} {metric}: {old:.3f} -> {new:.3f} ({change})")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions above {args.threshold:.0%} against {args.baseline}")
@@ -0,0 +1,186 @@
+import os
+import io
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import argparse
+import threading
+
+METRICS_LOG = "pipeline_metrics.jsonl"
+PROFILE_DIR = "pipeline_profiles"
+RSS_SAMPLE_SEC = 0.01
+TOP_FUNCTIONS = 15
+# Depth 0 is the whole script; its children are the stages worth profiling.
+PROFILE_DEPTH = 1
+
+# Off unless PIPELINE_METRICS is set (to "1" or a log path) or enable() is
+# called, e.g. by a script's --metrics flag. While off, span() hands back one
+# shared no-op object, so instrumented code pays a function call per span.
+_config = {"enabled": False, "log_file": METRICS_LOG, "profile": False, "script": None, "run": None}
+_local = threading.local()
+
+class PeakRSS:
+    # Samples this process's RSS on a background thread while a stage runs.
+    def __init__(self, interval=RSS_SAMPLE_SEC):
+        import psutil
+        self.process = psutil.Process()
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self.start = self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+class _NullSpan:
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault("stack", [])
+        self.path = "/".join([*stack, self.name])
+        self.depth = len(stack)
+        stack.append(self.name)
+        # cProfile only wraps stage spans; nested profilers would replace it.
+        self.profiler = cProfile.Profile() if _config["profile"] and self.depth == PROFILE_DEPTH else None
+        self.rss = PeakRSS().__enter__()
+        if self.profiler:
+            self.profiler.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        if self.profiler:
+            self.profiler.disable()
+        self.rss.__exit__()
+        _local.stack.pop()
+        record = {
+            "run": _config["run"],
+            "script": _config["script"],
+            "span": self.path,
+            "depth": self.depth,
+            "seconds": round(seconds, 6),
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows / seconds, 1) if self.rows and seconds > 0 else None,
+            "peak_rss_mb": round(self.rss.peak / 2**20, 1),
+            "rss_growth_mb": round((self.rss.peak - self.rss.start) / 2**20, 1),
+            "error": exc_type.__name__ if exc_type else None,
+            "ts": time.time(),
+        }
+        if self.profiler:
+            record.update(_save_profile(self.profiler, self.path))
+        with open(_config["log_file"], "a") as f:
+            f.write(json.dumps(record) + "\n")
+        return False
+
+def _save_profile(profiler, path):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    prof_file = os.path.join(PROFILE_DIR, f"{_config['run']}_{path.replace('/', '_')}.prof")
+    profiler.dump_stats(prof_file)
+    stats = pstats.Stats(profiler, stream=io.StringIO()).sort_stats("cumulative")
+    top = []
+    for func in stats.fcn_list[:TOP_FUNCTIONS]:
+        calls, _, own, cumulative, _ = stats.stats[func]
+        filename, line, name = func
+        top.append({"function": f"{os.path.basename(filename)}:{line}({name})", "calls": calls,
+                    "cumulative_sec": round(cumulative, 4), "self_sec": round(own, 4)})
+    return {"profile": prof_file, "top_functions": top}
+
+def enable(log_file=None, profile=False, script=None):
+    _config.update(
+        enabled=True,
+        log_file=log_file or _config["log_file"],
+        profile=profile,
+        script=script,
+        run=f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}",
+    )
+
+def disable():
+    # Pool initializer: forked workers inherit the parent's config and span
+    # stack, and their time is already counted in the parent's wait span.
+    _config["enabled"] = False
+    _local.__dict__.pop("stack", None)
+
+def enabled():
+    return _config["enabled"]
+
+def span(name, rows=None):
+    # `with span("to_sql", rows=len(df)):` or set `.rows` inside the block
+    # once the count is known.
+    if not _config["enabled"]:
+        return _NULL_SPAN
+    return _Span(name, rows)
+
+def add_arguments(parser):
+    parser.add_argument("--metrics", nargs="?", const=METRICS_LOG, default=None, metavar="LOG",
+                        help=f"Append stage timings/rows/peak RSS as JSON lines (default {METRICS_LOG})")
+    parser.add_argument("--profile", action="store_true", help=f"cProfile each stage into {PROFILE_DIR}/")
+
+def configure(args, script):
+    # Flags win; otherwise PIPELINE_METRICS=1|<log path> and PIPELINE_PROFILE=1.
+    env_log = os.getenv("PIPELINE_METRICS")
+    profile = args.profile or os.getenv("PIPELINE_PROFILE") == "1"
+    if args.metrics or env_log or profile:
+        log_file = args.metrics or (env_log if env_log not in (None, "1") else None)
+        enable(log_file, profile, script)
+
+def summarize(log_file=METRICS_LOG, run=None):
+    with open(log_file) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        print(f"⚠️ No metrics in {log_file}")
+        return
+    run = run or records[-1]["run"]
+    records = [r for r in records if r["run"] == run]
+    print(f"=== {records[0]['script']} run {run} ===")
+    # Spans that repeat (one per chunk) are rolled up under one line.
+    totals = {}
+    for r in records:
+        t = totals.setdefault(r["span"], {"depth": r["depth"], "start": r["ts"] - r["seconds"], "calls": 0,
+                                          "seconds": 0.0, "rows": 0, "peak_rss_mb": 0.0})
+        t["calls"] += 1
+        t["seconds"] += r["seconds"]
+        t["rows"] += r["rows"] or 0
+        t["peak_rss_mb"] = max(t["peak_rss_mb"], r["peak_rss_mb"])
+    # Parents start before their children, so start order reads as a tree.
+    for path, t in sorted(totals.items(), key=lambda item: item[1]["start"]):
+        rate = f"{t['rows'] / t['seconds']:>12,.0f} rows/s" if t["rows"] and t["seconds"] else ""
+        print(f"  {'  ' * t['depth']}{path.split('/')[-1]:<{30 - 2 * t['depth']}} {t['calls']:>5}x {t['seconds']:9.3f}s "
+              f"peak {t['peak_rss_mb']:8.1f} MB  {rate}")
+    for r in records:
+        if r.get("profile"):
+            print(f"  profile {r['span']} -> {r['profile']}")
+            for row in r["top_functions"]:
+                print(f"    {row['function']:<60} {row['cumulative_sec']:8.3f}s cumulative {row['self_sec']:8.3f}s self")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize pipeline stage metrics")
+    parser.add_argument("--log", default=METRICS_LOG)
+    parser.add_argument("--run", default=None, help="Run id (default: the most recent)")
+    args = parser.parse_args()
+    summarize(args.log, args.run)
@@ -0,0 +1,200 @@
+import os
+import shutil
+import argparse
+import operator
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from telemetry_schema import TELEMETRY_DTYPES, TRIP_DTYPES, DRIVER_DTYPES, apply_schema, read_telemetry_csv, read_trips_csv
+
+STORAGE_FORMATS = ["csv", "parquet"]
+CSV_FILES = {
+    "telemetry": "telemetry_data.csv",
+    "trips": "trip_data.csv",
+    "drivers": "driver_data.csv",
+}
+PARQUET_DIRS = {
+    "telemetry": "telemetry_parquet",
+    "trips": "trip_parquet",
+    "drivers": "driver_parquet",
+}
+# Hive-style directories, e.g. telemetry_parquet/driver_id=driver_3/date=2025-09-14/.
+# A telemetry row's date is its trip's start date, so a trip is never split
+# across partitions and chunked readers still see each trip contiguously.
+PARTITIONS = {
+    "telemetry": ["driver_id", "date"],
+    "trips": ["driver_id"],
+    "drivers": [],
+}
+SCHEMAS = {"telemetry": TELEMETRY_DTYPES, "trips": TRIP_DTYPES, "drivers": DRIVER_DTYPES}
+# Partitions come back in directory order, not the order rows were written,
+# so whole-dataset reads are sorted the way the producing stage sorted them.
+ORDER_BY = {"telemetry": ["trip_id", "timestamp"], "trips": ["trip_id"], "drivers": []}
+CSV_READERS = {"telemetry": read_telemetry_csv, "trips": read_trips_csv, "drivers": pd.read_csv}
+MAX_PARTITIONS = 1_000_000
+FILTER_OPS = {
+    "==": operator.eq, "=": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+def dataset_path(name, storage="csv", base_dir=""):
+    files = CSV_FILES if storage == "csv" else PARQUET_DIRS
+    return os.path.join(base_dir, files[name])
+
+def add_partition_columns(name, df):
+    if name == "telemetry" and "date" not in df.columns:
+        trip_start = df.groupby("trip_id", observed=True, sort=False)["timestamp"].min()
+        df = df.assign(date=df["trip_id"].map(trip_start.dt.strftime("%Y-%m-%d")))
+    return df
+
+def write_dataset(df, name, storage="csv", path=None, part=None):
+    # `part` appends one piece of a dataset written in chunks (0 starts it
+    # over); without it the dataset is replaced.
+    path = path or dataset_path(name, storage)
+    if storage == "csv":
+        df.to_csv(path, mode="a" if part else "w", header=not part, index=False)
+        return path
+
+    if not part and os.path.exists(path):
+        shutil.rmtree(path)
+    table = pa.Table.from_pandas(add_partition_columns(name, df), preserve_index=False)
+    partitioning = None
+    if PARTITIONS[name]:
+        for col in PARTITIONS[name]:
+            table = table.set_column(table.schema.get_field_index(col), col, table.column(col).cast(pa.string()))
+        partitioning = ds.partitioning(pa.schema([(col, pa.string()) for col in PARTITIONS[name]]), flavor="hive")
+    ds.write_dataset(
+        table, path, format="parquet", partitioning=partitioning,
+        basename_template=f"part-{part or 0}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore", max_partitions=MAX_PARTITIONS,
+    )
+    return path
+
+def _filter_frame(df, filters):
+    # Flat AND of (column, op, value) tuples, the same form pyarrow takes.
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        if op == "in":
+            mask &= df[col].isin(value)
+        elif op == "not in":
+            mask &= ~df[col].isin(value)
+        else:
+            mask &= FILTER_OPS[op](df[col], value)
+    return df[mask]
+
+def _finish(name, df, columns, filters=None):
+    # `date` is derived per frame, so with chunked CSV reads a trip split
+    # across chunks may be dated from its first row in the later chunk.
+    if filters or (columns and "date" in columns):
+        df = add_partition_columns(name, df)
+    if filters:
+        df = _filter_frame(df, filters).reset_index(drop=True)
+    df = df[columns] if columns is not None else df.drop(columns="date", errors="ignore")
+    return apply_schema(df, SCHEMAS[name])
+
+def _read_csv(name, path, columns, filters, chunksize):
+    # No pushdown for CSV: everything is parsed, then filtered and projected.
+    reader = CSV_READERS[name](path, chunksize=chunksize)
+    if chunksize is None:
+        return _finish(name, reader, columns, filters)
+    return (_finish(name, chunk, columns, filters) for chunk in reader)
+
+def _parquet_dataset(name, path):
+    partitioning = None
+    if PARTITIONS[name]:
+        partitioning = ds.partitioning(pa.schema([(col, pa.string()) for col in PARTITIONS[name]]), flavor="hive")
+    return ds.dataset(path, format="parquet", partitioning=partitioning)
+
+def _table_to_frame(name, table, columns):
+    df = table.to_pandas()
+    if columns is None:
+        # Partition columns come back last; restore the order they were written in.
+        written = [col["name"] for col in (table.schema.pandas_metadata or {}).get("columns", [])]
+        order = [col for col in written if col in df.columns and col != "date"]
+        df = df[order + [col for col in df.columns if col not in order and col != "date"]]
+    return apply_schema(df, SCHEMAS[name])
+
+def _rebatch(batches, chunksize):
+    # Scans yield at most one file per batch; regroup small files into chunks.
+    pending, rows = [], 0
+    for batch in batches:
+        if batch.num_rows:
+            pending.append(batch)
+            rows += batch.num_rows
+        if rows >= chunksize:
+            yield pa.Table.from_batches(pending)
+            pending, rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending)
+
+def read_dataset(name, storage="csv", columns=None, filters=None, chunksize=None, path=None):
+    # One reader for every stage. For Parquet, `columns` are the only ones
+    # decoded and `filters` prune partition directories (driver_id, date)
+    # and row groups (min/max stats) before anything is read.
+    path = path or dataset_path(name, storage)
+    if storage == "csv":
+        return _read_csv(name, path, columns, filters, chunksize)
+    dataset = _parquet_dataset(name, path)
+    expression = pq.filters_to_expression(filters) if filters else None
+    if chunksize is None:
+        df = _table_to_frame(name, dataset.to_table(columns=columns, filter=expression), columns)
+        order = [col for col in ORDER_BY[name] if col in df.columns]
+        return df.sort_values(order, kind="stable", ignore_index=True) if order else df
+    # Chunks are left in partition order: each trip is contiguous within
+    # one file, which is all the chunked consumers rely on.
+    batches = dataset.to_batches(columns=columns, filter=expression, batch_size=chunksize)
+    return (_table_to_frame(name, table, columns) for table in _rebatch(batches, chunksize))
+
+def dataset_exists(name, storage="csv", path=None):
+    return os.path.exists(path or dataset_path(name, storage))
+
+def files_scanned(name, filters, path=None):
+    dataset = _parquet_dataset(name, path or dataset_path(name, "parquet"))
+    expression = pq.filters_to_expression(filters) if filters else None
+    return len(list(dataset.get_fragments(filter=expression))), len(dataset.files)
+
+def driver_window_filters(driver_id, start, end):
+    # Rows in [start, end]. Trips that start the day before and run past
+    # midnight live in the previous date partition, so that one is scanned too.
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    return [
+        ("driver_id", "==", driver_id),
+        ("date", ">=", (start - pd.Timedelta(days=1)).strftime("%Y-%m-%d")),
+        ("date", "<=", end.strftime("%Y-%m-%d")),
+        ("timestamp", ">=", start),
+        ("timestamp", "<=", end),
+    ]
+
+def convert(names, source="csv", target="parquet"):
+    for name in names:
+        if not dataset_exists(name, source):
+            print(f"⚠️ {dataset_path(name, source)} not found")
+            continue
+        df = read_dataset(name, source)
+        print(f"✅ {name}: {len(df)} rows -> {write_dataset(df, name, target)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pipeline datasets between CSV and partitioned Parquet, or query one")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert")
+    conv.add_argument("--datasets", nargs="+", choices=list(CSV_FILES), default=list(CSV_FILES))
+    conv.add_argument("--from", dest="source", choices=STORAGE_FORMATS, default="csv")
+    conv.add_argument("--to", dest="target", choices=STORAGE_FORMATS, default="parquet")
+    query = sub.add_parser("query", help="One driver's telemetry in a time window")
+    query.add_argument("driver_id")
+    query.add_argument("--start", required=True)
+    query.add_argument("--end", required=True)
+    query.add_argument("--columns", nargs="+", default=["timestamp", "trip_id", "speed"])
+    query.add_argument("--storage", choices=STORAGE_FORMATS, default="parquet")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert(args.datasets, args.source, args.target)
+    else:
+        filters = driver_window_filters(args.driver_id, args.start, args.end)
+        df = read_dataset("telemetry", args.storage, columns=args.columns, filters=filters)
+        print(df)
+        if args.storage == "parquet":
+            scanned, total = files_scanned("telemetry", filters)
+            print(f"✅ {len(df)} rows from {scanned} of {total} files")
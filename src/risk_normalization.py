@@ -0,0 +1,305 @@
+import json
+import math
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+
+DB_FILE = "telematics.db"
+RISK_WEIGHTS = {
+    'total_harsh_brakes': 20,
+    'total_harsh_accels': 15,
+    'max_speed_overall': 20,
+    'night_trip_pct_overall': 10,
+    'claims_weighted_score': 25,
+}
+VEHICLE_RISK_MAP = {'Sedan': 0, 'SUV': 5, 'Sports Car': 15, 'Truck': 10, 'Electric': -5}
+MAX_VEHICLE_RISK = 15
+SKETCH_RELATIVE_ACCURACY = 0.01
+ROBUST_QUANTILES = (0.01, 0.5, 0.99)
+DRIFT_TOLERANCE = 0.05
+REBASE_BATCH_ROWS = 100_000
+
+class QuantileSketch:
+    # DDSketch-style log-bucketed counts: mergeable, fixed relative error on
+    # quantiles, size grows with log(max/min) rather than with the row count.
+    # Features here are non-negative; values <= 0 share one zero bucket.
+    def __init__(self, relative_accuracy=SKETCH_RELATIVE_ACCURACY, buckets=None, zero_count=0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.buckets = buckets if buckets is not None else {}
+        self.zero_count = zero_count
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zero_count += int(len(values) - len(positive))
+        keys, counts = np.unique(np.ceil(np.log(positive) / np.log(self.gamma)).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def remove(self, values):
+        # Takes back values added earlier (e.g. a driver's previous features).
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zero_count = max(0, self.zero_count - int(len(values) - len(positive)))
+        keys, counts = np.unique(np.ceil(np.log(positive) / np.log(self.gamma)).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            left = self.buckets.get(key, 0) - count
+            if left > 0:
+                self.buckets[key] = left
+            else:
+                self.buckets.pop(key, None)
+
+    def merge(self, other):
+        # Bucket boundaries only line up between sketches with the same accuracy.
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(f"Cannot merge sketches with relative accuracy {self.relative_accuracy} and {other.relative_accuracy}")
+        self.zero_count += other.zero_count
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        return self
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.buckets.values())
+
+    def quantile(self, q):
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_bytes(self):
+        keys = np.array(sorted(self.buckets), dtype=np.int64)
+        counts = np.array([self.buckets[k] for k in keys.tolist()], dtype=np.int64)
+        header = np.array([self.zero_count, len(keys)], dtype=np.int64)
+        return np.concatenate([header, keys, counts]).tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob, relative_accuracy=SKETCH_RELATIVE_ACCURACY):
+        data = np.frombuffer(blob, dtype=np.int64)
+        zero_count, n = int(data[0]), int(data[1])
+        buckets = dict(zip(data[2:2 + n].tolist(), data[2 + n:2 + 2 * n].tolist()))
+        return cls(relative_accuracy, buckets, zero_count)
+
+def create_normalization_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS risk_norm_observed (
+            feature TEXT PRIMARY KEY,
+            count INTEGER,
+            min REAL,
+            max REAL,
+            sketch BLOB
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS risk_norm_versions (
+            version INTEGER PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            num_drivers INTEGER,
+            stats TEXT
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS driver_risk_labels (
+            driver_id TEXT PRIMARY KEY,
+            enhanced_risk_score REAL,
+            norm_version INTEGER
+        );
+    """)
+
+def population_scale(df):
+    return {feature: {"min": float(df[feature].min()), "max": float(df[feature].max())} for feature in RISK_WEIGHTS}
+
+def enhanced_risk_score(df, scale=None):
+    # With a frozen scale each driver's score depends only on its own row, so
+    # new or changed drivers are labelled without touching anyone else. Without
+    # one it normalizes against df itself, as Final_Model.ipynb did.
+    scale = scale or population_scale(df)
+    weighted_sum = np.zeros(len(df))
+    for feature, weight in RISK_WEIGHTS.items():
+        min_val, max_val = scale[feature]["min"], scale[feature]["max"]
+        range_val = max_val - min_val if max_val > min_val else 1
+        weighted_sum += (df[feature].to_numpy(dtype=float) - min_val) / range_val * weight
+
+    vehicle_risk_raw = df['vehicle_type'].map(VEHICLE_RISK_MAP).fillna(0).to_numpy(dtype=float)
+    vehicle_risk_norm = (vehicle_risk_raw + 5) / (MAX_VEHICLE_RISK + 5)
+    weighted_sum += vehicle_risk_norm * (100 - sum(RISK_WEIGHTS.values()))
+    return np.clip(weighted_sum, 0, 100)
+
+def load_observed(conn):
+    rows = conn.execute("SELECT feature, count, min, max, sketch FROM risk_norm_observed").fetchall()
+    return {
+        feature: {"count": count, "min": min_val, "max": max_val, "sketch": QuantileSketch.from_bytes(sketch)}
+        for feature, count, min_val, max_val, sketch in rows
+    }
+
+def save_observed(conn, observed):
+    conn.executemany(
+        "INSERT OR REPLACE INTO risk_norm_observed (feature, count, min, max, sketch) VALUES (?, ?, ?, ?, ?)",
+        [(f, s["count"], s["min"], s["max"], s["sketch"].to_bytes()) for f, s in observed.items()],
+    )
+
+def observe_drivers(observed, df):
+    # Running stats over the drivers' current values. min/max only ever
+    # widen; rebase() rebuilds them exactly from the drivers table.
+    for feature in RISK_WEIGHTS:
+        values = df[feature].to_numpy(dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            continue
+        stats = observed.setdefault(feature, {"count": 0, "min": math.inf, "max": -math.inf, "sketch": QuantileSketch()})
+        stats["count"] += len(values)
+        stats["min"] = min(stats["min"], float(values.min()))
+        stats["max"] = max(stats["max"], float(values.max()))
+        stats["sketch"].add(values)
+    return observed
+
+def unobserve_drivers(observed, df):
+    # Removes drivers' earlier values from the count and sketch, so a driver
+    # whose features change is counted once, with its new values.
+    for feature in RISK_WEIGHTS:
+        values = df[feature].to_numpy(dtype=float)
+        values = values[~np.isnan(values)]
+        stats = observed.get(feature)
+        if stats is None or not len(values):
+            continue
+        stats["count"] = max(0, stats["count"] - len(values))
+        stats["sketch"].remove(values)
+    return observed
+
+def freeze_scale(observed):
+    return {
+        feature: {
+            "min": s["min"],
+            "max": s["max"],
+            **{f"p{round(q * 100):02d}": s["sketch"].quantile(q) for q in ROBUST_QUANTILES},
+        }
+        for feature, s in observed.items()
+    }
+
+def active_scale(conn):
+    row = conn.execute("SELECT version, stats FROM risk_norm_versions ORDER BY version DESC LIMIT 1").fetchone()
+    return (row[0], json.loads(row[1])) if row else (None, None)
+
+def scale_drift(observed, scale):
+    # Largest shift of any feature's min or max, relative to its frozen range.
+    drift = 0.0
+    for feature, s in observed.items():
+        frozen = scale.get(feature)
+        if frozen is None:
+            return math.inf
+        range_val = frozen["max"] - frozen["min"] if frozen["max"] > frozen["min"] else 1
+        drift = max(drift, abs(s["min"] - frozen["min"]) / range_val, abs(s["max"] - frozen["max"]) / range_val)
+    return drift
+
+def _upsert_labels(conn, driver_ids, scores, version):
+    conn.executemany(
+        """
+        INSERT INTO driver_risk_labels (driver_id, enhanced_risk_score, norm_version) VALUES (?, ?, ?)
+        ON CONFLICT(driver_id) DO UPDATE SET
+            enhanced_risk_score = excluded.enhanced_risk_score,
+            norm_version = excluded.norm_version
+        """,
+        zip(list(driver_ids), np.asarray(scores, dtype=float).tolist(), [version] * len(scores)),
+    )
+
+def label_drivers(conn, drivers_df, previous_df=None, tolerance=DRIFT_TOLERANCE):
+    # Called with the new/changed driver rows only, plus those drivers' rows
+    # from before the change. Scores use the active (frozen) scale; the
+    # caller creates the tables and owns the transaction.
+    observed = load_observed(conn)
+    if previous_df is not None and not previous_df.empty:
+        # Only drivers already labelled were observed (by rebase or here).
+        labelled = pd.read_sql("SELECT driver_id FROM driver_risk_labels", conn)['driver_id']
+        unobserve_drivers(observed, previous_df[previous_df['driver_id'].isin(labelled)])
+    observe_drivers(observed, drivers_df)
+    save_observed(conn, observed)
+    version, scale = active_scale(conn)
+    if version is None:
+        # First drivers into an empty store: their stats become version 1.
+        scale = freeze_scale(observed)
+        version = conn.execute(
+            "INSERT INTO risk_norm_versions (num_drivers, stats) VALUES (?, ?)", (len(drivers_df), json.dumps(scale))
+        ).lastrowid
+    _upsert_labels(conn, drivers_df['driver_id'], enhanced_risk_score(drivers_df, scale), version)
+    drift = scale_drift(observed, scale)
+    if drift > tolerance:
+        print(f"⚠️ Normalization stats drifted {drift:.1%} from version {version}; run risk_normalization.py rebase")
+    return drift
+
+def rebase(db_file=DB_FILE, batch_rows=REBASE_BATCH_ROWS, tolerance=None):
+    # Rebuilds the observed stats from the drivers table, freezes them as a
+    # new version and relabels every driver, one batch at a time. With a
+    # tolerance it only does so when the current version has drifted past it.
+    conn = sqlite3.connect(db_file)
+    try:
+        create_normalization_tables(conn)
+        version, scale = active_scale(conn)
+        if tolerance is not None and version is not None:
+            drift = scale_drift(load_observed(conn), scale)
+            if drift <= tolerance:
+                print(f"✅ Version {version} within tolerance (drift {drift:.1%}), no rebase needed")
+                return version
+
+        columns = ", ".join(["driver_id", "vehicle_type", *RISK_WEIGHTS])
+        observed = {}
+        num_drivers = 0
+        for batch in pd.read_sql(f"SELECT {columns} FROM drivers", conn, chunksize=batch_rows):
+            observe_drivers(observed, batch)
+            num_drivers += len(batch)
+        if not num_drivers:
+            print("⚠️ No drivers to rebase on")
+            return version
+
+        scale = freeze_scale(observed)
+        with conn:
+            conn.execute("DELETE FROM risk_norm_observed")
+            save_observed(conn, observed)
+            version = conn.execute(
+                "INSERT INTO risk_norm_versions (num_drivers, stats) VALUES (?, ?)", (num_drivers, json.dumps(scale))
+            ).lastrowid
+        for batch in pd.read_sql(f"SELECT {columns} FROM drivers", conn, chunksize=batch_rows):
+            with conn:
+                _upsert_labels(conn, batch['driver_id'], enhanced_risk_score(batch, scale), version)
+    finally:
+        conn.close()
+    print(f"✅ Rebased normalization stats to version {version} on {num_drivers} drivers")
+    return version
+
+def status(db_file=DB_FILE):
+    conn = sqlite3.connect(db_file)
+    create_normalization_tables(conn)
+    version, scale = active_scale(conn)
+    observed = load_observed(conn)
+    conn.close()
+    if version is None:
+        print("⚠️ No normalization version yet; run rebase")
+        return
+    print(f"Active version {version}, drift {scale_drift(observed, scale):.1%}")
+    for feature, frozen in scale.items():
+        s = observed.get(feature, {})
+        print(f"  {feature:<24} frozen [{frozen['min']:.3f}, {frozen['max']:.3f}]  observed [{s.get('min', float('nan')):.3f}, {s.get('max', float('nan')):.3f}]")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Versioned normalization stats for enhanced_risk_score")
+    parser.add_argument("command", choices=["status", "rebase"])
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--tolerance", type=float, default=None, help="Only rebase if drift exceeds this")
+    parser.add_argument("--batch-rows", type=int, default=REBASE_BATCH_ROWS)
+    args = parser.parse_args()
+    if args.command == "rebase":
+        rebase(args.db, args.batch_rows, args.tolerance)
+    else:
+        status(args.db)
@@ -0,0 +1,134 @@
+import sqlite3
+import argparse
+import hashlib
+import os
+import pandas as pd
+
+DB_FILE = "telematics.db"
+MODEL_PATH = "stacking_model.pkl"
+SQLITE_MAX_PARAMS = 500
+HERE = os.path.dirname(os.path.abspath(__file__))
+# train_model writes the model next to this module; the committed one is in models/.
+MODEL_DIRS = [HERE, os.path.join(os.path.dirname(HERE), "models")]
+
+def create_driver_scores_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS driver_scores (
+            driver_id TEXT,
+            feature_hash TEXT,
+            model_version TEXT,
+            predicted_risk_score REAL,
+            is_current INTEGER,
+            scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (driver_id, feature_hash, model_version)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_driver_scores_current ON driver_scores (is_current, driver_id)")
+    conn.commit()
+
+def resolve_model_path(model_path=MODEL_PATH):
+    # A relative path is tried from the working directory first, then from the
+    # model directories, so load_db finds the model whichever directory it runs from.
+    if os.path.isabs(model_path) or os.path.exists(model_path):
+        return model_path
+    for model_dir in MODEL_DIRS:
+        candidate = os.path.join(model_dir, model_path)
+        if os.path.exists(candidate):
+            return candidate
+    return model_path
+
+def model_version(model_path=MODEL_PATH):
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def feature_hashes(drivers_df):
+    # Normalize dtypes first so a driver read back from SQLite (REAL columns)
+    # hashes the same as one built from the CSV (int columns).
+    features = drivers_df.drop(columns=["driver_id"])
+    for col in features.columns:
+        if pd.api.types.is_numeric_dtype(features[col]):
+            features[col] = features[col].astype("float64")
+        else:
+            features[col] = features[col].astype(str)
+    hashes = pd.util.hash_pandas_object(features, index=False)
+    return hashes.map("{:016x}".format).to_numpy()
+
+def _read_drivers(conn, driver_ids=None):
+    if driver_ids is None:
+        return pd.read_sql("SELECT * FROM drivers", conn)
+    driver_ids = list(driver_ids)
+    frames = []
+    for i in range(0, len(driver_ids), SQLITE_MAX_PARAMS):
+        batch = driver_ids[i:i + SQLITE_MAX_PARAMS]
+        frames.append(pd.read_sql(
+            f"SELECT * FROM drivers WHERE driver_id IN ({', '.join('?' * len(batch))})", conn, params=batch
+        ))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def refresh_driver_scores(db_file=DB_FILE, model_path=MODEL_PATH, driver_ids=None, predict=None):
+    model_path = resolve_model_path(model_path)
+    if not os.path.exists(model_path):
+        print(f"⚠️ {model_path} not found, driver scores not refreshed")
+        return 0
+    version = model_version(model_path)
+    conn = sqlite3.connect(db_file)
+    try:
+        create_driver_scores_table(conn)
+        drivers = _read_drivers(conn, driver_ids)
+        if drivers.empty:
+            return 0
+        drivers = drivers.fillna(0)
+        drivers["feature_hash"] = feature_hashes(drivers)
+
+        scored = pd.read_sql(
+            "SELECT driver_id, feature_hash, is_current FROM driver_scores WHERE model_version = ?",
+            conn, params=(version,),
+        )
+        drivers = drivers.merge(scored, on=["driver_id", "feature_hash"], how="left")
+        up_to_date = drivers["is_current"] == 1
+        reusable = drivers["is_current"] == 0
+        stale = drivers[drivers["is_current"].isna()]
+
+        # Only unseen (features, model) combinations go through the model.
+        if not stale.empty:
+            if predict is None:
+                import joblib
+                predict = joblib.load(model_path).predict
+            risk = predict(stale.drop(columns=["driver_id", "feature_hash", "is_current"]))
+            new_rows = pd.DataFrame({
+                "driver_id": stale["driver_id"].to_numpy(),
+                "feature_hash": stale["feature_hash"].to_numpy(),
+                "model_version": version,
+                "predicted_risk_score": pd.Series(risk, dtype="float64").to_numpy(),
+                "is_current": 0,
+            })
+
+        changed = drivers.loc[~up_to_date, ["driver_id", "feature_hash"]]
+        with conn:
+            conn.executemany(
+                "UPDATE driver_scores SET is_current = 0 WHERE driver_id = ? AND is_current = 1",
+                [(d,) for d in changed["driver_id"]],
+            )
+            if not stale.empty:
+                conn.executemany(
+                    "INSERT INTO driver_scores (driver_id, feature_hash, model_version, predicted_risk_score, is_current) VALUES (?, ?, ?, ?, ?)",
+                    new_rows.to_numpy(dtype=object).tolist(),
+                )
+            conn.executemany(
+                "UPDATE driver_scores SET is_current = 1, scored_at = CURRENT_TIMESTAMP WHERE driver_id = ? AND feature_hash = ? AND model_version = ?",
+                [(d, h, version) for d, h in changed.itertuples(index=False)],
+            )
+    finally:
+        conn.close()
+    print(f"✅ Driver scores for model {version}: {len(stale)} scored, {int(reusable.sum())} reused, {int(up_to_date.sum())} unchanged")
+    return len(stale)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score drivers whose features or model version changed")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--model", default=MODEL_PATH)
+    args = parser.parse_args()
+    refresh_driver_scores(args.db, args.model)
@@ -0,0 +1,183 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+import numpy as np
+import pandas as pd
+import joblib
+
+MODEL_PATH = "stacking_model.pkl"
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_WAIT_MS = 5
+MAX_BATCH_ROWS = 50_000
+LATENCY_WINDOW = 10_000
+
+class ScoringMetrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def record_request(self, latency_ms, rows):
+        with self._lock:
+            self.latencies_ms.append(latency_ms)
+            self.requests += 1
+            self.rows += rows
+
+    def record_batch(self):
+        with self._lock:
+            self.batches += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self.latencies_ms)
+            elapsed = time.monotonic() - self.started
+            return {
+                "requests": self.requests,
+                "rows": self.rows,
+                "batches": self.batches,
+                "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+                "requests_per_sec": self.requests / elapsed,
+                "rows_per_sec": self.rows / elapsed,
+                "requests_per_batch": self.requests / self.batches if self.batches else None,
+            }
+
+def check_columns(features, columns):
+    missing = [c for c in columns if c not in features.columns]
+    unexpected = [c for c in features.columns if c not in columns]
+    if missing or unexpected:
+        raise ValueError(f"Feature columns don't match the model: missing {missing}, unexpected {unexpected}")
+    return features[columns]
+
+class MicroBatcher:
+    # Requests that arrive within max_wait_ms of the first queued one are
+    # concatenated and scored with a single model.predict call.
+    def __init__(self, model, metrics, max_wait_ms=MAX_WAIT_MS, max_batch_rows=MAX_BATCH_ROWS):
+        self.model = model
+        self.metrics = metrics
+        # Requests are checked against the model's training columns before
+        # they are queued, so a malformed one is rejected on its own.
+        self.columns = list(getattr(model, "feature_names_in_", [])) or None
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, features):
+        if self.columns is not None:
+            features = check_columns(features, self.columns)
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _predict_each(self, batch):
+        for features, future in batch:
+            try:
+                future.set_result(self.model.predict(features))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.metrics.record_batch()
+            try:
+                predictions = self.model.predict(pd.concat([f for f, _ in batch], ignore_index=True))
+            except Exception:
+                # e.g. a request with bad values; score the batch one request
+                # at a time so only that request fails.
+                self._predict_each(batch)
+                continue
+            offset = 0
+            for features, future in batch:
+                future.set_result(predictions[offset:offset + len(features)])
+                offset += len(features)
+
+def make_handler(batcher, metrics):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send_json(200, metrics.snapshot())
+            elif self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            start = time.perf_counter()
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                features = pd.read_json(StringIO(body), orient="split", convert_dates=False)
+                predictions = batcher.submit(features).result()
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            metrics.record_request((time.perf_counter() - start) * 1000, len(features))
+            self._send_json(200, {"predictions": np.asarray(predictions, dtype=float).tolist()})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoringHandler
+
+def serve(model_path=MODEL_PATH, host=HOST, port=PORT, max_wait_ms=MAX_WAIT_MS):
+    model = joblib.load(model_path)
+    metrics = ScoringMetrics()
+    batcher = MicroBatcher(model, metrics, max_wait_ms=max_wait_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, metrics))
+    print(f"✅ Scoring service for {model_path} listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve micro-batched risk predictions from the stacking model")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+    serve(args.model, args.host, args.port, args.max_wait_ms)
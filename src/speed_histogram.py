@@ -0,0 +1,72 @@
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+
+# Fixed-width bins so counts from separate ingestion batches can simply be
+# added together; bin b covers [b * width, (b + 1) * width) mph.
+SPEED_BIN_MPH = 2
+DB_FILE = "telematics.db"
+
+def create_speed_histogram_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS speed_histogram (
+            driver_id TEXT,
+            bin INTEGER,
+            samples INTEGER,
+            PRIMARY KEY (driver_id, bin)
+        ) WITHOUT ROWID;
+    """)
+    conn.commit()
+
+def speed_bin_counts(telemetry_df, bin_mph=SPEED_BIN_MPH):
+    bins = np.floor(telemetry_df["speed"].to_numpy(dtype=float) / bin_mph)
+    counts = pd.DataFrame({"driver_id": telemetry_df["driver_id"].to_numpy(), "bin": bins})
+    counts = counts.dropna().astype({"bin": "int64"})
+    return counts.groupby(["driver_id", "bin"]).size().rename("samples").reset_index()
+
+def record_speed_histogram(conn, telemetry_df, bin_mph=SPEED_BIN_MPH):
+    counts = speed_bin_counts(telemetry_df, bin_mph)
+    conn.executemany(
+        """
+        INSERT INTO speed_histogram (driver_id, bin, samples) VALUES (?, ?, ?)
+        ON CONFLICT(driver_id, bin) DO UPDATE SET samples = samples + excluded.samples
+        """,
+        counts.to_numpy(dtype=object).tolist(),
+    )
+    return len(counts)
+
+def remove_speed_histogram(conn, telemetry_df, bin_mph=SPEED_BIN_MPH):
+    # Takes back what record_speed_histogram added for these telemetry rows.
+    counts = speed_bin_counts(telemetry_df, bin_mph)
+    conn.executemany(
+        "UPDATE speed_histogram SET samples = samples - ? WHERE driver_id = ? AND bin = ?",
+        counts[["samples", "driver_id", "bin"]].to_numpy(dtype=object).tolist(),
+    )
+    conn.execute("DELETE FROM speed_histogram WHERE samples <= 0")
+    return len(counts)
+
+def rebuild_speed_histogram(db_file=DB_FILE, bin_mph=SPEED_BIN_MPH):
+    # Backfill for databases loaded before the histogram was maintained at ingestion.
+    conn = sqlite3.connect(db_file)
+    create_speed_histogram_table(conn)
+    with conn:
+        conn.execute("DELETE FROM speed_histogram")
+        conn.execute(
+            """
+            INSERT INTO speed_histogram (driver_id, bin, samples)
+            SELECT driver_id, CAST(speed / ? AS INTEGER), COUNT(*)
+            FROM telemetry_secure WHERE speed IS NOT NULL
+            GROUP BY 1, 2
+            """,
+            (float(bin_mph),),
+        )
+    rows = conn.execute("SELECT COUNT(*) FROM speed_histogram").fetchone()[0]
+    conn.close()
+    print(f"✅ Rebuilt speed_histogram: {rows} (driver, bin) rows")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the per-driver speed histogram from telemetry_secure")
+    parser.add_argument("--db", default=DB_FILE)
+    args = parser.parse_args()
+    rebuild_speed_histogram(args.db)
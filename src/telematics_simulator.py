@@ -1,95 +1,174 @@
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
-
-def get_road_type_segments(trip_duration_sec, sample_interval_sec):
-    total_samples = trip_duration_sec // sample_interval_sec
-    fractions = {'highway': 0.3, 'city': 0.5, 'residential': 0.2}
-    types = list(fractions)
-    counts = [int(fractions[t] * total_samples) for t in types]
-    for i in range(total_samples - sum(counts)):
-        counts[i % len(counts)] += 1
-    segments = []
-    for t, c in zip(types, counts):
-        segments += [t] * c
-    return segments  
-
-def simulate_telemetry_df(num_drivers=30, trips_per_driver=10, min_trip_min=1, max_trip_hr=1, sample_interval_sec=5):
-    records = []
-    HARSH_BRAKE_PROB = {'city': 0.02, 'highway': 0.005, 'residential': 0.01}
-    HARSH_ACCEL_PROB = {'city': 0.02, 'highway': 0.05, 'residential': 0.01}
-    engine_on = 1
-
-    MIN_LAT, MAX_LAT = 36.5, 45.0
-    MIN_LON, MAX_LON = -94.0, -81.0
-
-    for driver in range(1, num_drivers + 1):
-        driver_id = f'driver_{driver}'
-        for trip in range(1, trips_per_driver + 1):
-            trip_id = f'{driver_id}_trip_{trip}'
-            trip_duration_sec = random.randint(min_trip_min * 60, max_trip_hr * 3600)
-            samples_per_trip = max(1, trip_duration_sec // sample_interval_sec)
-
-            night_prob = 0.3
-            if random.random() < night_prob:
-                start_hour = random.choice(list(range(22,24))+list(range(0,6)))
-            else:
-                start_hour = random.randint(6, 21)
-            start_minute = random.randint(0, 59)
-            start_time = datetime.now().replace(hour=start_hour, minute=start_minute, second=0, microsecond=0)
-            start_time -= timedelta(days=random.randint(0, 10))
-            prev_speed = random.uniform(20, 50)
-
-            def get_road_type_segments(trip_duration_sec, sample_interval_sec):
-                total_samples = trip_duration_sec // sample_interval_sec
-                fractions = {'residential': 0.4, 'city': 0.4, 'highway': 0.2}
-                types = list(fractions)
-                counts = [int(fractions[t] * total_samples) for t in types]
-                for i in range(total_samples - sum(counts)):
-                    counts[i % len(counts)] += 1
-                segments = []
-                for t, c in zip(types, counts):
-                    segments += [t] * c
-                return segments
-
-            road_types = get_road_type_segments(trip_duration_sec, sample_interval_sec)
-
-            for sample in range(samples_per_trip):
-                timestamp = start_time + timedelta(seconds=sample * sample_interval_sec)
-                road_type = road_types[sample]
-                road_speed_limits = {'highway': (65, 90), 'city': (20, 50), 'residential': (10, 30)}
-                mean_speed, max_speed = road_speed_limits[road_type]
-                speed = max(0, min(np.random.normal(mean_speed, 8), max_speed))
-
-                acceleration = (speed - prev_speed) / sample_interval_sec
-                if random.random() < HARSH_BRAKE_PROB[road_type]:
-                    acceleration = random.uniform(-7, -4)
-                if random.random() < HARSH_ACCEL_PROB[road_type]:
-                    acceleration = random.uniform(4, 7)
-
-                lat = random.uniform(MIN_LAT, MAX_LAT)
-                lon = random.uniform(MIN_LON, MAX_LON)
-
-                records.append({
-                    'timestamp': timestamp,
-                    'trip_id': trip_id,
-                    'driver_id': driver_id,
-                    'lat': lat,
-                    'lon': lon,
-                    'speed': speed,
-                    'acceleration': acceleration,
-                    'road_type': road_type,
-                    'engine_on': engine_on
-                })
-                prev_speed = speed
-
-    telemetry_df = pd.DataFrame(records)
-    telemetry_df['timestamp'] = pd.to_datetime(telemetry_df['timestamp'])
-    telemetry_df['road_type'] = telemetry_df['road_type'].astype('category')
-    return telemetry_df
+import os
+import argparse
+import pipeline_metrics
+import pipeline_storage
+from telemetry_schema import ROAD_TYPES, TELEMETRY_DTYPES, compact_telemetry
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+ROAD_SPEED_LIMITS = {'highway': (65, 90), 'city': (20, 50), 'residential': (10, 30)}
+HARSH_BRAKE_PROB = {'city': 0.02, 'highway': 0.005, 'residential': 0.01}
+HARSH_ACCEL_PROB = {'city': 0.02, 'highway': 0.05, 'residential': 0.01}
+NIGHT_HOURS = list(range(22, 24)) + list(range(0, 6))
+NIGHT_PROB = 0.3
+
+MIN_LAT, MAX_LAT = 36.5, 45.0
+MIN_LON, MAX_LON = -94.0, -81.0
+
+def road_type_codes(samples_per_trip, sample_in_trip):
+    # Residential, city, highway blocks (40/40/20) with the rounding remainder
+    # handed out round-robin, as in the per-sample loop this replaces.
+    samples = samples_per_trip.astype(np.int64)
+    residential = np.floor(0.4 * samples).astype(np.int64)
+    city = np.floor(0.4 * samples).astype(np.int64)
+    highway = np.floor(0.2 * samples).astype(np.int64)
+    remainder = samples - residential - city - highway
+    residential += remainder >= 1
+    city += remainder >= 2
+    highway += remainder >= 3
+
+    codes = np.full(len(sample_in_trip), ROAD_TYPES.index('highway'), dtype=np.int8)
+    codes[sample_in_trip < np.repeat(residential + city, samples)] = ROAD_TYPES.index('city')
+    codes[sample_in_trip < np.repeat(residential, samples)] = ROAD_TYPES.index('residential')
+    return codes
+
+def simulate_trips(rng, driver_numbers, trips_per_driver=10, min_trip_min=1, max_trip_hr=1, sample_interval_sec=5, now=None):
+    driver_numbers = np.asarray(driver_numbers, dtype=np.int64)
+    trip_driver = np.repeat(driver_numbers, trips_per_driver)
+    trip_number = np.tile(np.arange(1, trips_per_driver + 1), len(driver_numbers))
+    num_trips = len(trip_driver)
+
+    trip_duration_sec = rng.integers(min_trip_min * 60, max_trip_hr * 3600, size=num_trips, endpoint=True)
+    samples_per_trip = np.maximum(1, trip_duration_sec // sample_interval_sec)
+
+    is_night = rng.random(num_trips) < NIGHT_PROB
+    start_hour = np.where(
+        is_night,
+        rng.choice(NIGHT_HOURS, size=num_trips),
+        rng.integers(6, 21, size=num_trips, endpoint=True),
+    )
+    start_minute = rng.integers(0, 59, size=num_trips, endpoint=True)
+    days_back = rng.integers(0, 10, size=num_trips, endpoint=True)
+    today = (pd.Timestamp.now() if now is None else pd.Timestamp(now)).normalize()
+    start_time = (
+        today.to_datetime64()
+        + (start_hour * 3600 + start_minute * 60 - days_back * 86400).astype('timedelta64[s]')
+    )
+    initial_speed = rng.uniform(20, 50, size=num_trips)
+
+    num_rows = int(samples_per_trip.sum())
+    trip_index = np.repeat(np.arange(num_trips), samples_per_trip)
+    trip_start = np.cumsum(samples_per_trip) - samples_per_trip
+    sample_in_trip = np.arange(num_rows) - np.repeat(trip_start, samples_per_trip)
+
+    timestamp = start_time[trip_index] + (sample_in_trip * sample_interval_sec).astype('timedelta64[s]')
+
+    road_code = road_type_codes(samples_per_trip, sample_in_trip)
+    mean_speed = np.array([ROAD_SPEED_LIMITS[t][0] for t in ROAD_TYPES], dtype=float)[road_code]
+    max_speed = np.array([ROAD_SPEED_LIMITS[t][1] for t in ROAD_TYPES], dtype=float)[road_code]
+    speed = np.clip(rng.normal(mean_speed, 8), 0, max_speed)
+
+    prev_speed = np.empty(num_rows)
+    prev_speed[1:] = speed[:-1]
+    prev_speed[trip_start] = initial_speed
+    acceleration = (speed - prev_speed) / sample_interval_sec
+
+    brake_prob = np.array([HARSH_BRAKE_PROB[t] for t in ROAD_TYPES])[road_code]
+    accel_prob = np.array([HARSH_ACCEL_PROB[t] for t in ROAD_TYPES])[road_code]
+    harsh_brake = rng.random(num_rows) < brake_prob
+    acceleration[harsh_brake] = rng.uniform(-7, -4, size=int(harsh_brake.sum()))
+    harsh_accel = rng.random(num_rows) < accel_prob
+    acceleration[harsh_accel] = rng.uniform(4, 7, size=int(harsh_accel.sum()))
+
+    lat = rng.uniform(MIN_LAT, MAX_LAT, size=num_rows)
+    lon = rng.uniform(MIN_LON, MAX_LON, size=num_rows)
+
+    # One string per trip/driver in the categorical lookups; rows carry codes.
+    driver_ids = pd.Categorical([f'driver_{d}' for d in trip_driver])
+    trip_ids = pd.Categorical([f'driver_{d}_trip_{t}' for d, t in zip(trip_driver, trip_number)])
+
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(timestamp).astype(TELEMETRY_DTYPES['timestamp']),
+        'trip_id': pd.Categorical.from_codes(trip_ids.codes[trip_index], dtype=trip_ids.dtype),
+        'driver_id': pd.Categorical.from_codes(driver_ids.codes[trip_index], dtype=driver_ids.dtype),
+        'lat': lat,
+        'lon': lon,
+        'speed': speed.astype(TELEMETRY_DTYPES['speed']),
+        'acceleration': acceleration.astype(TELEMETRY_DTYPES['acceleration']),
+        'road_type': pd.Categorical.from_codes(road_code, dtype=TELEMETRY_DTYPES['road_type']),
+        'engine_on': np.ones(num_rows, dtype=TELEMETRY_DTYPES['engine_on']),
+    })
+
+def simulate_telemetry_df(num_drivers=30, trips_per_driver=10, min_trip_min=1, max_trip_hr=1, sample_interval_sec=5, seed=None):
+    rng = np.random.default_rng(seed)
+    return simulate_trips(
+        rng, range(1, num_drivers + 1), trips_per_driver,
+        min_trip_min=min_trip_min, max_trip_hr=max_trip_hr, sample_interval_sec=sample_interval_sec,
+    )
+
+def driver_rng(master_seed, driver):
+    return np.random.default_rng(np.random.SeedSequence(master_seed, spawn_key=(driver,)))
+
+def simulate_shard(driver_numbers, master_seed, now, **trip_kwargs):
+    frames = [simulate_trips(driver_rng(master_seed, d), [d], now=now, **trip_kwargs) for d in driver_numbers]
+    return compact_telemetry(pd.concat(frames, ignore_index=True))
+
+def simulate_telemetry_sharded(num_drivers=30, trips_per_driver=10, min_trip_min=1, max_trip_hr=1, sample_interval_sec=5,
+                               seed=42, workers=None, drivers_per_shard=100, storage='csv', path=None):
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+    now = pd.Timestamp.now()
+    trip_kwargs = dict(trips_per_driver=trips_per_driver, min_trip_min=min_trip_min,
+                       max_trip_hr=max_trip_hr, sample_interval_sec=sample_interval_sec)
+    drivers = list(range(1, num_drivers + 1))
+    shards = [drivers[i:i + drivers_per_shard] for i in range(0, num_drivers, drivers_per_shard)]
+
+    # Shards are written here, in shard order, as parts of the one telemetry
+    # dataset; at most max_in_flight simulated shards are held in memory.
+    def write(part, future):
+        shard_df = future.result()
+        print(f"Simulated {len(shard_df)} rows (shard {part})")
+        pipeline_storage.write_dataset(shard_df, "telemetry", storage, path=path, part=part)
+        return len(shard_df)
+
+    total = 0
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part, shard in enumerate(shards):
+            if len(in_flight) >= max_in_flight:
+                total += write(*in_flight.popleft())
+            in_flight.append((part, pool.submit(simulate_shard, shard, seed, now, **trip_kwargs)))
+        while in_flight:
+            total += write(*in_flight.popleft())
+    return path or pipeline_storage.dataset_path("telemetry", storage), total
 
 if __name__ == "__main__":
-    df = simulate_telemetry_df()
-    df.to_csv('telemetry_data.csv', index=False)
-    print("Simulated telemetry data (Midwest only) saved to telemetry_data.csv")
+    parser = argparse.ArgumentParser(description="Simulate Midwest telematics data")
+    parser.add_argument("--drivers", type=int, default=30)
+    parser.add_argument("--trips", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Run sharded across a process pool")
+    parser.add_argument("--drivers-per-shard", type=int, default=100)
+    parser.add_argument("--storage", choices=pipeline_storage.STORAGE_FORMATS, default="csv",
+                        help="Hand-off format for the next stage")
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure(args, "telematics_simulator")
+
+    with pipeline_metrics.span("telematics_simulator"):
+        if args.workers:
+            with pipeline_metrics.span("simulate_sharded") as span:
+                path, span.rows = simulate_telemetry_sharded(
+                    args.drivers, args.trips, seed=42 if args.seed is None else args.seed, workers=args.workers,
+                    drivers_per_shard=args.drivers_per_shard, storage=args.storage,
+                )
+            print(f"Simulated telemetry data (Midwest only) saved to {path}")
+        else:
+            with pipeline_metrics.span("simulate") as span:
+                df = simulate_telemetry_df(args.drivers, args.trips, seed=args.seed)
+                span.rows = len(df)
+            with pipeline_metrics.span(f"write_{args.storage}", rows=len(df)):
+                path = pipeline_storage.write_dataset(df, "telemetry", args.storage)
+            print(f"Simulated telemetry data (Midwest only) saved to {path}")
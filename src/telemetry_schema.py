@@ -0,0 +1,117 @@
+import io
+import argparse
+import pandas as pd
+
+ROAD_TYPES = ['city', 'highway', 'residential']
+
+# One dtype per column, used by the simulator, the CSV loaders and (copied in
+# Dashboard/data_access.py) the dashboards. IDs are categoricals: small int
+# codes per row plus one lookup of the distinct strings, sorted so ordering
+# and groupby results match the plain-string frames. lat/lon stay float64:
+# float32 would move points by up to ~0.5 m and change what gets encrypted.
+TELEMETRY_DTYPES = {
+    'timestamp': 'datetime64[ns]',
+    'trip_id': 'category',
+    'driver_id': 'category',
+    'lat': 'float64',
+    'lon': 'float64',
+    'speed': 'float32',
+    'acceleration': 'float32',
+    'road_type': pd.CategoricalDtype(ROAD_TYPES),
+    'engine_on': 'uint8',
+    'geohash': 'category',
+}
+
+# Trip features stay float64: they are summed into driver features and fed to
+# the model, so only the IDs and event counts shrink.
+TRIP_DTYPES = {
+    'trip_id': 'category',
+    'driver_id': 'category',
+    'num_harsh_brakes': 'int32',
+    'num_harsh_accels': 'int32',
+}
+
+DRIVER_DTYPES = {
+    'driver_id': 'category',
+    'total_harsh_brakes': 'int32',
+    'total_harsh_accels': 'int32',
+}
+
+def csv_dtypes(schema, columns=None):
+    # read_csv arguments for a schema: dtype for everything but timestamps,
+    # which go through parse_dates.
+    dtypes = {col: dtype for col, dtype in schema.items() if dtype != 'datetime64[ns]' and (columns is None or col in columns)}
+    parse_dates = [col for col, dtype in schema.items() if dtype == 'datetime64[ns]' and (columns is None or col in columns)]
+    return {'dtype': dtypes, 'parse_dates': parse_dates}
+
+def _read_csv(path, schema, chunksize=None):
+    # read_csv's categories aren't in sorted order, so every frame goes
+    # through apply_schema to sort the lookups.
+    columns = pd.read_csv(path, nrows=0).columns
+    reader = pd.read_csv(path, **csv_dtypes(schema, columns), chunksize=chunksize)
+    if chunksize is None:
+        return apply_schema(reader, schema)
+    return (apply_schema(chunk, schema) for chunk in reader)
+
+def read_telemetry_csv(path, chunksize=None):
+    return _read_csv(path, TELEMETRY_DTYPES, chunksize)
+
+def read_trips_csv(path, chunksize=None):
+    return _read_csv(path, TRIP_DTYPES, chunksize)
+
+def apply_schema(df, schema):
+    df = df.copy(deep=False)
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'category' and isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Keep the lookup sorted, e.g. after concatenating per-driver frames.
+            df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories))
+        elif df[col].dtype == dtype:
+            continue
+        elif dtype == 'datetime64[ns]':
+            df[col] = pd.to_datetime(df[col]).astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def compact_telemetry(df):
+    return apply_schema(df, TELEMETRY_DTYPES)
+
+def compact_trips(df):
+    return apply_schema(df, TRIP_DTYPES)
+
+def memory_report(before, after):
+    rows = max(len(before), 1)
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'bytes_per_row_before': before.memory_usage(deep=True, index=False) / rows,
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_per_row_after': after.memory_usage(deep=True, index=False) / rows,
+    })
+    report.loc['TOTAL'] = ['', report['bytes_per_row_before'].sum(), '', report['bytes_per_row_after'].sum()]
+    report['saved_pct'] = 100 * (1 - report['bytes_per_row_after'] / report['bytes_per_row_before'])
+    return report.round(2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-row memory of telemetry frames before/after the compact schema")
+    parser.add_argument("--csv", default=None, help="Telemetry CSV to measure (default: simulate one)")
+    parser.add_argument("--drivers", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.csv:
+        source = args.csv
+    else:
+        from telematics_simulator import simulate_telemetry_df
+        source = io.StringIO(simulate_telemetry_df(args.drivers, seed=0).to_csv(index=False))
+    # "Before" is a plain read, which is also what SQLite hands back:
+    # object strings, float64/int64 and string timestamps.
+    before = pd.read_csv(source)
+    after = compact_telemetry(before)
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", None)
+    print(f"=== {len(before):,} telemetry rows ===")
+    print(memory_report(before, after))
+    per_million_before = before.memory_usage(deep=True).sum() / len(before) * 1e6 / 2**20
+    per_million_after = after.memory_usage(deep=True).sum() / len(after) * 1e6 / 2**20
+    print(f"✅ {per_million_before:.0f} MB -> {per_million_after:.0f} MB per million rows")
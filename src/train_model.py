@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import joblib
+from threadpoolctl import threadpool_limits
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, StackingRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+import risk_normalization
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Dashboard"))
+from compiled_model import export_model
+from scoring_client import model_sha256
+
+DB_FILE = "telematics.db"
+MODEL_PATH = "stacking_model.pkl"
+CACHE_DIR = "train_cache"
+REPORT_PATH = "training_report.csv"
+RANDOM_STATE = 42
+CV_FOLDS = 5
+TEST_SIZE = 0.2
+CATEGORICAL_FEATURES = ['vehicle_type']
+MODEL_NAMES = ['CatBoost', 'RandomForest', 'XGBoost', 'GradientBoosting', 'StackingEnsemble']
+
+def load_training_frame(db_file=DB_FILE):
+    # Training only needs driver-level features; trips and telemetry are never read.
+    # Labels use the active normalization version when there is one, so they
+    # match driver_risk_labels; otherwise the population min/max as before.
+    with sqlite3.connect(db_file) as conn:
+        df = pd.read_sql("SELECT * FROM drivers", conn)
+        risk_normalization.create_normalization_tables(conn)
+        _, scale = risk_normalization.active_scale(conn)
+    df['enhanced_risk_score'] = risk_normalization.enhanced_risk_score(df, scale)
+    X = df.drop(columns=['driver_id', 'enhanced_risk_score'])
+    y = df['enhanced_risk_score'].to_numpy(dtype=float)
+    return X, y
+
+def make_preprocessor(categorical, numeric):
+    # Column names for a DataFrame, or positions in the cached array.
+    return ColumnTransformer(
+        transformers=[
+            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical),
+            ('num', 'passthrough', numeric)
+        ]
+    )
+
+def build_models(threads=1):
+    # No preprocessor here: run_task fits one per fold, fit_final_model one
+    # for the saved pipeline. `threads` caps each model's own parallelism
+    # inside a pool worker.
+    rf = RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=threads)
+    gbr = GradientBoostingRegressor(random_state=RANDOM_STATE)
+    models = {
+        'RandomForest': rf,
+        'GradientBoosting': gbr,
+    }
+    try:
+        from xgboost import XGBRegressor
+        models['XGBoost'] = XGBRegressor(random_state=RANDOM_STATE, verbosity=0, n_jobs=threads)
+    except ImportError:
+        pass
+    try:
+        from catboost import CatBoostRegressor
+        models['CatBoost'] = CatBoostRegressor(random_seed=RANDOM_STATE, verbose=0, thread_count=threads)
+    except ImportError:
+        pass
+    estimators = [(name, models[key]) for name, key in [('rf', 'RandomForest'), ('xgb', 'XGBoost'), ('gbr', 'GradientBoosting')] if key in models]
+    models['StackingEnsemble'] = StackingRegressor(
+        estimators=estimators,
+        final_estimator=Ridge(alpha=1.0),
+        passthrough=True,
+        n_jobs=threads
+    )
+    return models
+
+def frame_hash(X, y):
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    digest.update(json.dumps(list(X.columns)).encode())
+    return digest.hexdigest()[:16]
+
+def cache_design_matrix(X, y, cache_dir=CACHE_DIR):
+    # The feature matrix is written once as .npy files and memory-mapped by
+    # every worker. Categories are stored as integer codes: the one-hot
+    # encoder is fit inside each fold, on that fold's training rows only, so
+    # no category vocabulary leaks in from the held-out rows.
+    key = frame_hash(X, y)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("key") == key and "categorical" in meta:
+            print(f"✅ Reusing cached feature matrix {key}")
+            return key
+    os.makedirs(cache_dir, exist_ok=True)
+    codes = X.copy()
+    for col in CATEGORICAL_FEATURES:
+        codes[col] = pd.factorize(codes[col])[0]
+    np.save(os.path.join(cache_dir, "X.npy"), codes.to_numpy(dtype=np.float64))
+    np.save(os.path.join(cache_dir, "y.npy"), y)
+    meta = {
+        "key": key,
+        "columns": list(X.columns),
+        "categorical": [X.columns.get_loc(col) for col in CATEGORICAL_FEATURES],
+        "rows": len(X),
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    print(f"✅ Cached feature matrix {key}: {len(X)} rows x {X.shape[1]} columns")
+    return key
+
+def run_task(cache_dir, model_name, split, train_idx, test_idx, threads):
+    X = np.load(os.path.join(cache_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(cache_dir, "y.npy"), mmap_mode="r")
+    with open(os.path.join(cache_dir, "meta.json")) as f:
+        categorical = json.load(f)["categorical"]
+    numeric = [i for i in range(X.shape[1]) if i not in categorical]
+    model = Pipeline([('preprocessor', make_preprocessor(categorical, numeric)), ('model', build_models(threads)[model_name])])
+    with threadpool_limits(limits=threads):
+        start = time.perf_counter()
+        model.fit(X[train_idx], y[train_idx])
+        fit_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        y_pred = model.predict(X[test_idx])
+        predict_sec = time.perf_counter() - start
+    y_true = y[test_idx]
+    return {
+        "model": model_name,
+        "split": split,
+        "MAE": mean_absolute_error(y_true, y_pred),
+        "RMSE": np.sqrt(mean_squared_error(y_true, y_pred)),
+        "R²": r2_score(y_true, y_pred),
+        "fit_sec": fit_sec,
+        "predict_sec": predict_sec,
+    }
+
+def evaluate_models(num_rows, cache_dir=CACHE_DIR, model_names=None, folds=CV_FOLDS, workers=None, threads_per_worker=1):
+    model_names = [name for name in (model_names or MODEL_NAMES) if name in build_models()]
+    indices = np.arange(num_rows)
+    splits = [(f"cv{i}", train, test) for i, (train, test) in
+              enumerate(KFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE).split(indices))]
+    train, test = train_test_split(indices, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+    splits.append(("holdout", train, test))
+
+    # Every (model, split) pair is an independent task. Workers x threads is
+    # kept at or below the core count so BLAS/OpenMP pools don't oversubscribe.
+    workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+    tasks = [(name, split, tr, te) for name in model_names for split, tr, te in splits]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_task, cache_dir, name, split, tr, te, threads_per_worker) for name, split, tr, te in tasks]
+        results = pd.DataFrame([future.result() for future in futures])
+
+    cv = results[results["split"] != "holdout"].groupby("model")[["MAE", "RMSE", "R²", "fit_sec", "predict_sec"]].mean()
+    holdout = results[results["split"] == "holdout"].set_index("model")[["MAE", "RMSE", "R²", "fit_sec", "predict_sec"]]
+    report = cv.join(holdout, rsuffix="_holdout").reindex(model_names)
+    return report, results
+
+def fit_final_model(X, y, threads=1):
+    # Same artifact as the notebook: the full preprocessing + stacking
+    # pipeline fitted on the training split.
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+    numeric = [col for col in X.columns if col not in CATEGORICAL_FEATURES]
+    pipeline = Pipeline([('preprocessor', make_preprocessor(CATEGORICAL_FEATURES, numeric)), ('model', build_models(threads)['StackingEnsemble'])])
+    with threadpool_limits(limits=threads):
+        pipeline.fit(X_train, y_train)
+    return pipeline
+
+def main(db_file=DB_FILE, cache_dir=CACHE_DIR, model_path=MODEL_PATH, report_path=REPORT_PATH,
+         model_names=None, folds=CV_FOLDS, workers=None, threads_per_worker=1, skip_final=False):
+    start = time.perf_counter()
+    X, y = load_training_frame(db_file)
+    cache_design_matrix(X, y, cache_dir)
+    missing = sorted(set(model_names or MODEL_NAMES) - set(build_models()))
+    if missing:
+        print(f"⚠️ Skipping models whose libraries are not installed: {', '.join(missing)}")
+
+    report, _ = evaluate_models(len(X), cache_dir, model_names, folds, workers, threads_per_worker)
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", None)
+    print(f"=== {folds}-fold CV (mean) and hold-out results ===")
+    print(report.round(4))
+    report.to_csv(report_path)
+
+    if not skip_final:
+        pipeline = fit_final_model(X, y, threads=os.cpu_count() or 1)
+        joblib.dump(pipeline, model_path)
+        print(f"✅ Saved {model_path}")
+        # Re-export the NumPy artifact the dashboards prefer, tagged with this pkl's hash.
+        compiled_path = os.path.splitext(model_path)[0] + ".npz"
+        try:
+            export_model(pipeline, compiled_path, source_sha256=model_sha256(model_path))
+            print(f"✅ Compiled {compiled_path}")
+        except ValueError as e:
+            print(f"⚠️ {compiled_path} not written: {e}")
+    print(f"✅ Training finished in {time.perf_counter() - start:.1f}s")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and evaluate the risk models from the drivers table")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--out", default=MODEL_PATH)
+    parser.add_argument("--report", default=REPORT_PATH)
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES, default=None)
+    parser.add_argument("--folds", type=int, default=CV_FOLDS)
+    parser.add_argument("--workers", type=int, default=None, help="Processes for CV folds and models")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="BLAS/OpenMP/model threads per process")
+    parser.add_argument("--skip-final", action="store_true", help="Only evaluate; don't write the model")
+    args = parser.parse_args()
+    main(args.db, args.cache_dir, args.out, args.report, args.models, args.folds,
+         args.workers, args.threads_per_worker, args.skip_final)
@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# The pipeline scripts import each other as top-level modules from src/.
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, os.path.join(SRC_DIR, "Dashboard"))
+
+import score_store
+
+@pytest.fixture(autouse=True)
+def no_trained_model(monkeypatch, tmp_path):
+    # Loading and updating the store rescores drivers; tests that don't pass
+    # their own model should not pick up the trained one from models/.
+    monkeypatch.setattr(score_store, "MODEL_DIRS", [str(tmp_path)])
@@ -0,0 +1,21 @@
+import os
+import pandas as pd
+import pytest
+from Driver_features import aggregate_driver_features
+from telemetry_schema import read_trips_csv
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+HISTORY_COLUMNS = [
+    'years_driving', 'num_claims', 'num_violations', 'vehicle_age', 'vehicle_type',
+    'insurance_policy_length_years', 'claims_weighted_score',
+]
+
+@pytest.mark.parametrize("shuffle_seed", [None, 3])
+def test_matches_published_driver_data_in_any_trip_order(shuffle_seed):
+    trips = read_trips_csv(os.path.join(DATA_DIR, "trip_data.csv"))
+    if shuffle_seed is not None:
+        trips = trips.sample(frac=1, random_state=shuffle_seed)
+    expected = pd.read_csv(os.path.join(DATA_DIR, "driver_data.csv")).set_index('driver_id')
+    drivers = aggregate_driver_features(trips).astype({'driver_id': str}).set_index('driver_id').loc[expected.index]
+    pd.testing.assert_frame_equal(drivers[HISTORY_COLUMNS], expected[HISTORY_COLUMNS], check_dtype=False)
+    pd.testing.assert_series_equal(drivers['total_miles'], expected['total_miles'], rtol=1e-9)
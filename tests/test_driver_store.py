@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from telematics_simulator import simulate_telemetry_df
+from feature_extraction import aggregate_trip_features
+from Driver_features import aggregate_driver_features
+import driver_store
+import load_db
+
+SCHEMA_FILE = os.path.join(os.path.dirname(load_db.__file__), "Schema.sql")
+
+@pytest.fixture(scope="module")
+def trips():
+    return aggregate_trip_features(simulate_telemetry_df(num_drivers=6, trips_per_driver=4, seed=5))
+
+@pytest.fixture
+def db_file(tmp_path):
+    db_file = str(tmp_path / "telematics.db")
+    load_db.create_db(SCHEMA_FILE, db_file)
+    return db_file
+
+def read_table(db_file, table):
+    with sqlite3.connect(db_file) as conn:
+        return pd.read_sql(f"SELECT * FROM {table} ORDER BY rowid", conn)
+
+def split_batches(trips):
+    # Every driver's first trip comes in the first batch, so drivers are first
+    # seen in the same order as in a single pass over all trips.
+    trip_ids = trips['trip_id'].astype(str)
+    first = trip_ids.groupby(trips['driver_id'], observed=True).transform('min') == trip_ids
+    first |= np.arange(len(trips)) % 3 == 0
+    return trips[first], trips[~first]
+
+def test_incremental_updates_match_full_aggregation(trips, db_file):
+    first, second = split_batches(trips)
+    driver_store.update_driver_features(first, db_file=db_file)
+    driver_store.update_driver_features(second, db_file=db_file)
+
+    expected = aggregate_driver_features(trips).astype({'driver_id': str}).set_index('driver_id').sort_index()
+    actual = read_table(db_file, "drivers").set_index('driver_id').sort_index()[expected.columns]
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+
+    stored_trips = read_table(db_file, "trips")
+    assert sorted(stored_trips['trip_id']) == sorted(trips['trip_id'].astype(str))
+    trip_counts = stored_trips.groupby('driver_id').size()
+    assert (actual['num_trips'] == trip_counts.reindex(actual.index)).all()
+
+def test_resending_a_batch_changes_nothing(trips, db_file):
+    first, second = split_batches(trips)
+    driver_store.update_driver_features(first, db_file=db_file)
+    driver_store.update_driver_features(second, db_file=db_file)
+    before = {table: read_table(db_file, table) for table in ["drivers", "trips", "driver_accumulators"]}
+
+    driver_store.update_driver_features(second, db_file=db_file)
+    for table, frame in before.items():
+        pd.testing.assert_frame_equal(read_table(db_file, table), frame, obj=table)
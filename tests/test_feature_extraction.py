@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from telematics_simulator import simulate_telemetry_df
+from feature_extraction import aggregate_trip_features, iter_trip_features, TRIP_FEATURE_COLUMNS
+
+# Sensors are float32 in memory (telemetry_schema), so sums taken in a
+# different order only agree to float32 precision.
+RTOL = 1e-5
+COUNT_COLUMNS = ['num_harsh_brakes', 'num_harsh_accels']
+
+def reference_trip_features(telemetry_df):
+    # The original per-trip loop, kept as the parity reference.
+    trip_features = []
+    telemetry_df = telemetry_df.sort_values(['trip_id', 'timestamp'])
+    telemetry_df['time_diff'] = telemetry_df.groupby('trip_id', observed=True)['timestamp'].diff().dt.total_seconds().fillna(5)
+
+    for trip_id, trip in telemetry_df.groupby('trip_id', observed=True):
+        speed = trip['speed'].astype(np.float64)
+        acceleration = trip['acceleration'].astype(np.float64)
+        trip_features.append({
+            'trip_id': trip_id,
+            'driver_id': trip['driver_id'].iloc[0],
+            'trip_duration_min': trip['time_diff'].sum() / 60,
+            'total_miles': (speed * trip['time_diff'] / 3600).sum(),
+            'avg_speed': speed.mean(),
+            'max_speed': speed.max(),
+            'num_harsh_brakes': (acceleration < -3 * 2.23694).sum(),
+            'num_harsh_accels': (acceleration > 3 * 2.23694).sum(),
+            'idling_pct': trip[(speed < 5) & (trip['engine_on'] == 1)]['time_diff'].sum() / trip['time_diff'].sum(),
+            'night_trip_pct': ((trip['timestamp'].dt.hour >= 22) | (trip['timestamp'].dt.hour < 5)).mean(),
+            'urban_pct': (trip['road_type'] == 'city').mean(),
+            'highway_pct': (trip['road_type'] == 'highway').mean(),
+        })
+    return pd.DataFrame(trip_features)
+
+@pytest.fixture(scope="module")
+def telemetry():
+    # Shuffled so neither side can rely on the simulator's row order.
+    return simulate_telemetry_df(num_drivers=20, trips_per_driver=5, seed=7).sample(frac=1, random_state=0)
+
+def test_matches_reference_loop(telemetry):
+    expected = reference_trip_features(telemetry)
+    actual = aggregate_trip_features(telemetry)
+
+    assert list(actual.columns) == TRIP_FEATURE_COLUMNS
+    assert len(actual) == len(expected) == telemetry['trip_id'].nunique()
+    for col in ['trip_id', 'driver_id', *COUNT_COLUMNS]:
+        assert actual[col].astype(str).tolist() == expected[col].astype(str).tolist(), col
+    for col in TRIP_FEATURE_COLUMNS:
+        if col not in ['trip_id', 'driver_id', *COUNT_COLUMNS]:
+            np.testing.assert_allclose(actual[col].to_numpy(), expected[col].to_numpy(), rtol=RTOL, err_msg=col)
+
+def chunks_of(df, size):
+    return (df.iloc[i:i + size] for i in range(0, len(df), size))
+
+def test_chunked_matches_single_pass(telemetry):
+    ordered = telemetry.sort_values(['trip_id', 'timestamp'], ignore_index=True)
+    expected = aggregate_trip_features(ordered)
+    actual = pd.concat(list(iter_trip_features(chunks_of(ordered, 997))), ignore_index=True)
+
+    assert actual['trip_id'].astype(str).tolist() == expected['trip_id'].astype(str).tolist()
+    np.testing.assert_allclose(actual['trip_duration_min'], expected['trip_duration_min'], rtol=RTOL)
+    np.testing.assert_allclose(actual['total_miles'], expected['total_miles'], rtol=RTOL)
+
+@pytest.mark.parametrize("chunksize", [997, 50])
+def test_chunked_rejects_non_contiguous_trip(telemetry, chunksize):
+    ordered = telemetry.sort_values(['trip_id', 'timestamp'], ignore_index=True)
+    first_trip = ordered['trip_id'] == ordered['trip_id'].iloc[0]
+    second_trip = ordered['trip_id'] == ordered.loc[~first_trip, 'trip_id'].iloc[0]
+    head = ordered[first_trip].iloc[:10]
+    # The rest of the first trip arrives after the next trip was closed,
+    # within one chunk (997) or in a later one (50).
+    shuffled = pd.concat([
+        head, ordered[second_trip], ordered[first_trip].iloc[10:], ordered[~first_trip & ~second_trip],
+    ], ignore_index=True)
+    with pytest.raises(ValueError, match="not contiguous"):
+        list(iter_trip_features(chunks_of(shuffled, chunksize)))
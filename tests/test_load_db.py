@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import pandas as pd
+import pytest
+from cryptography.fernet import Fernet
+from telematics_simulator import simulate_telemetry_df
+import load_db
+
+SCHEMA_FILE = os.path.join(os.path.dirname(load_db.__file__), "Schema.sql")
+DERIVED_TABLES = {
+    "harsh_events": "SELECT trip_id, driver_id, timestamp, event_type, magnitude FROM harsh_events ORDER BY trip_id, timestamp, event_type",
+    "harsh_event_daily": "SELECT * FROM harsh_event_daily ORDER BY driver_id, day",
+    "speed_histogram": "SELECT * FROM speed_histogram ORDER BY driver_id, bin",
+}
+
+@pytest.fixture
+def telemetry_files(tmp_path):
+    csv_path = tmp_path / "telemetry_data.csv"
+    key_file = tmp_path / "secret.key"
+    simulate_telemetry_df(num_drivers=4, trips_per_driver=3, seed=11).to_csv(csv_path, index=False)
+    key_file.write_bytes(Fernet.generate_key())
+    db_file = tmp_path / "telematics.db"
+    load_db.create_db(SCHEMA_FILE, str(db_file))
+    return str(csv_path), str(db_file), str(key_file)
+
+def derived_tables(db_file):
+    with sqlite3.connect(db_file) as conn:
+        return {name: pd.read_sql(sql, conn) for name, sql in DERIVED_TABLES.items()}
+
+def test_block_reload_leaves_derived_tables_unchanged(telemetry_files):
+    csv_path, db_file, key_file = telemetry_files
+    load_db.encrypt_and_insert_telemetry_blocks(csv_path, db_file, key_file)
+    first = derived_tables(db_file)
+    assert len(first["harsh_events"]) > 0
+    load_db.encrypt_and_insert_telemetry_blocks(csv_path, db_file, key_file)
+    second = derived_tables(db_file)
+    for name in DERIVED_TABLES:
+        pd.testing.assert_frame_equal(first[name], second[name], obj=name)
+    with sqlite3.connect(db_file) as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM telemetry_secure").fetchone()[0]
+    assert rows == len(pd.read_csv(csv_path))
@@ -0,0 +1,92 @@
+import os
+import pandas as pd
+import pytest
+import pipeline_storage
+from telematics_simulator import simulate_telemetry_df
+from feature_extraction import aggregate_trip_features
+
+@pytest.fixture(scope="module")
+def datasets(tmp_path_factory):
+    base_dir = tmp_path_factory.mktemp("storage")
+    telemetry = simulate_telemetry_df(num_drivers=4, trips_per_driver=5, seed=2)
+    frames = {"telemetry": telemetry, "trips": aggregate_trip_features(telemetry)}
+    paths = {}
+    for name, df in frames.items():
+        csv_path = pipeline_storage.write_dataset(df, name, "csv", path=str(base_dir / pipeline_storage.CSV_FILES[name]))
+        parquet_path = str(base_dir / pipeline_storage.PARQUET_DIRS[name])
+        pipeline_storage.write_dataset(pipeline_storage.read_dataset(name, "csv", path=csv_path), name, "parquet", path=parquet_path)
+        paths[name] = {"csv": csv_path, "parquet": parquet_path}
+    return paths
+
+def read(datasets, name, storage, **kwargs):
+    return pipeline_storage.read_dataset(name, storage, path=datasets[name][storage], **kwargs)
+
+def normalized(name, df):
+    # Category lookups depend on which rows were read; compare the values.
+    df = df.astype({col: str for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    order = [col for col in pipeline_storage.ORDER_BY[name] if col in df.columns]
+    return df.sort_values(order, kind="stable", ignore_index=True) if order else df.reset_index(drop=True)
+
+def assert_same_rows(name, actual, expected):
+    pd.testing.assert_frame_equal(normalized(name, actual), normalized(name, expected))
+
+@pytest.mark.parametrize("name", ["telemetry", "trips"])
+def test_parquet_round_trip_matches_csv(datasets, name):
+    expected = read(datasets, name, "csv")
+    actual = read(datasets, name, "parquet")
+    assert list(actual.columns) == list(expected.columns)
+    assert actual.dtypes.to_dict() == expected.dtypes.to_dict()
+    assert_same_rows(name, actual, expected)
+
+def test_hive_partitions_by_driver_and_trip_start_date(datasets):
+    telemetry = read(datasets, "telemetry", "csv")
+    trip_start = telemetry.groupby("trip_id", observed=True)["timestamp"].min().dt.strftime("%Y-%m-%d")
+    expected = {
+        f"driver_id={driver_id}/date={trip_start[trip_id]}"
+        for driver_id, trip_id in telemetry[["driver_id", "trip_id"]].drop_duplicates().itertuples(index=False)
+    }
+    root = datasets["telemetry"]["parquet"]
+    files = [os.path.relpath(os.path.join(d, f), root) for d, _, fs in os.walk(root) for f in fs]
+    assert {os.path.dirname(f) for f in files} == expected
+
+    trips_root = datasets["trips"]["parquet"]
+    assert sorted(os.listdir(trips_root)) == sorted(f"driver_id={d}" for d in telemetry["driver_id"].unique())
+
+def test_filters_match_csv_and_prune_files(datasets):
+    telemetry = read(datasets, "telemetry", "csv")
+    driver_id = telemetry["driver_id"].iloc[0]
+    driver_rows = telemetry[telemetry["driver_id"] == driver_id]
+    start, end = driver_rows["timestamp"].quantile([0.2, 0.6])
+    filters = pipeline_storage.driver_window_filters(driver_id, start, end)
+
+    expected = read(datasets, "telemetry", "csv", filters=filters)
+    actual = read(datasets, "telemetry", "parquet", filters=filters)
+    assert len(actual) > 0
+    assert_same_rows("telemetry", actual, expected)
+    assert ((actual["driver_id"] == driver_id) & actual["timestamp"].between(start, end)).all()
+
+    scanned, total = pipeline_storage.files_scanned("telemetry", filters, path=datasets["telemetry"]["parquet"])
+    assert 0 < scanned < total
+
+def test_column_projection(datasets):
+    columns = ["trip_id", "timestamp", "speed"]
+    filters = [("speed", ">", 30)]
+    expected = read(datasets, "telemetry", "csv", columns=columns, filters=filters)
+    actual = read(datasets, "telemetry", "parquet", columns=columns, filters=filters)
+    assert list(actual.columns) == columns
+    assert actual.dtypes.to_dict() == expected.dtypes.to_dict()
+    assert_same_rows("telemetry", actual, expected)
+
+@pytest.mark.parametrize("chunksize", [100, 1500])
+def test_chunked_parquet_read_round_trips(datasets, chunksize):
+    expected = read(datasets, "telemetry", "csv")
+    chunks = list(read(datasets, "telemetry", "parquet", chunksize=chunksize))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= chunksize for chunk in chunks[:-1])
+
+    actual = pd.concat(chunks, ignore_index=True)
+    assert_same_rows("telemetry", actual, expected)
+    # Chunked consumers need each trip as one contiguous run of rows.
+    trip_ids = actual["trip_id"].astype(str)
+    runs = trip_ids[trip_ids.ne(trip_ids.shift())]
+    assert runs.is_unique
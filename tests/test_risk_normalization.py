@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+import risk_normalization
+from risk_normalization import QuantileSketch, RISK_WEIGHTS
+
+QUANTILES = [0.0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0]
+
+@pytest.fixture(scope="module")
+def values():
+    rng = np.random.default_rng(3)
+    # Spans several orders of magnitude, with some zeros like the harsh event counts.
+    return np.concatenate([rng.lognormal(mean=2, sigma=2, size=20_000), np.zeros(500)])
+
+def exact_quantile(values, q):
+    # The value at the rank QuantileSketch.quantile targets.
+    return np.sort(values)[int(np.floor(q * (len(values) - 1)))]
+
+def assert_within_relative_accuracy(sketch, values):
+    for q in QUANTILES:
+        expected = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - expected) <= sketch.relative_accuracy * expected + 1e-12, q
+
+def test_quantiles_within_relative_accuracy(values):
+    for accuracy in [0.01, 0.05]:
+        sketch = QuantileSketch(accuracy)
+        sketch.add(values)
+        assert sketch.count == len(values)
+        assert_within_relative_accuracy(sketch, values)
+
+def test_merged_sketch_equals_single_sketch(values):
+    whole = QuantileSketch()
+    whole.add(values)
+    merged = QuantileSketch()
+    for part in np.array_split(values, 7):
+        sketch = QuantileSketch()
+        sketch.add(part)
+        merged.merge(QuantileSketch.from_bytes(sketch.to_bytes()))
+
+    assert merged.buckets == whole.buckets
+    assert merged.zero_count == whole.zero_count
+    assert_within_relative_accuracy(merged, values)
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError, match="relative accuracy"):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+def make_drivers(ids, seed):
+    rng = np.random.default_rng(seed)
+    drivers = pd.DataFrame({feature: rng.uniform(0, 50, len(ids)) for feature in RISK_WEIGHTS})
+    drivers.insert(0, 'driver_id', ids)
+    drivers['vehicle_type'] = rng.choice(list(risk_normalization.VEHICLE_RISK_MAP), len(ids))
+    return drivers
+
+def read_labels(conn):
+    return pd.read_sql("SELECT * FROM driver_risk_labels ORDER BY driver_id", conn).set_index('driver_id')
+
+def test_rebase_adds_a_version_and_keeps_earlier_ones(tmp_path):
+    db_file = str(tmp_path / "telematics.db")
+    first = make_drivers([f"D{i:03d}" for i in range(40)], seed=1)
+    # Later drivers are wider than the first ones, so the frozen scale drifts.
+    later = make_drivers([f"D{i:03d}" for i in range(40, 60)], seed=2)
+    later[list(RISK_WEIGHTS)] *= 3
+
+    with sqlite3.connect(db_file) as conn:
+        risk_normalization.create_normalization_tables(conn)
+        first.to_sql("drivers", conn, index=False)
+        risk_normalization.label_drivers(conn, first)
+        v1_labels = read_labels(conn)
+        later.to_sql("drivers", conn, index=False, if_exists="append")
+        drift = risk_normalization.label_drivers(conn, later)
+        # Labelling new drivers scores them on version 1 and leaves earlier labels alone.
+        labels = read_labels(conn)
+        pd.testing.assert_frame_equal(labels.loc[v1_labels.index], v1_labels)
+        assert (labels['norm_version'] == 1).all()
+        v1_stats = conn.execute("SELECT stats FROM risk_norm_versions WHERE version = 1").fetchone()[0]
+    assert drift > risk_normalization.DRIFT_TOLERANCE
+
+    assert risk_normalization.rebase(db_file, batch_rows=7) == 2
+    with sqlite3.connect(db_file) as conn:
+        versions = pd.read_sql("SELECT version, num_drivers, stats FROM risk_norm_versions ORDER BY version", conn)
+        labels = read_labels(conn)
+    assert versions['version'].tolist() == [1, 2]
+    assert versions['stats'].iloc[0] == v1_stats
+    assert versions['num_drivers'].iloc[1] == 60
+
+    v2_scale = json.loads(versions['stats'].iloc[1])
+    everyone = pd.concat([first, later], ignore_index=True).set_index('driver_id')
+    assert v2_scale['max_speed_overall']['max'] == everyone['max_speed_overall'].max()
+    assert (labels['norm_version'] == 2).all()
+    np.testing.assert_allclose(
+        labels.loc[everyone.index, 'enhanced_risk_score'],
+        risk_normalization.enhanced_risk_score(everyone, v2_scale),
+    )
+
+    # Within tolerance, rebase keeps the current version.
+    assert risk_normalization.rebase(db_file, tolerance=risk_normalization.DRIFT_TOLERANCE) == 2
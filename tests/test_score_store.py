@@ -0,0 +1,85 @@
+import sqlite3
+import pandas as pd
+import pytest
+import score_store
+
+DRIVERS = pd.DataFrame({
+    "driver_id": ["D1", "D2", "D3"],
+    "total_miles": [120.0, 80.5, 300.25],
+    "num_trips": [4, 2, 9],
+    "vehicle_type": ["sedan", "suv", "truck"],
+})
+
+class CountingModel:
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.scored = []
+
+    def predict(self, X):
+        self.scored.append(len(X))
+        return X["total_miles"].to_numpy() / 100 + self.offset
+
+@pytest.fixture
+def store(tmp_path):
+    db_file = str(tmp_path / "telematics.db")
+    with sqlite3.connect(db_file) as conn:
+        DRIVERS.to_sql("drivers", conn, index=False)
+    model_path = tmp_path / "model_a.pkl"
+    model_path.write_bytes(b"model a")
+    return db_file, str(model_path)
+
+def scores(db_file):
+    with sqlite3.connect(db_file) as conn:
+        return pd.read_sql("SELECT * FROM driver_scores ORDER BY driver_id, scored_at, model_version", conn)
+
+def current(db_file):
+    rows = scores(db_file)
+    return rows[rows["is_current"] == 1].set_index("driver_id")
+
+def test_unchanged_drivers_are_not_rescored(store):
+    db_file, model_path = store
+    model = CountingModel()
+    assert score_store.refresh_driver_scores(db_file, model_path, predict=model.predict) == 3
+    assert score_store.refresh_driver_scores(db_file, model_path, predict=model.predict) == 0
+    assert model.scored == [3]
+    assert len(scores(db_file)) == 3
+    assert len(current(db_file)) == 3
+
+def test_feature_change_retires_old_score(store):
+    db_file, model_path = store
+    model = CountingModel()
+    score_store.refresh_driver_scores(db_file, model_path, predict=model.predict)
+    before = current(db_file)
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("UPDATE drivers SET total_miles = 150.0 WHERE driver_id = 'D2'")
+
+    assert score_store.refresh_driver_scores(db_file, model_path, predict=model.predict) == 1
+    rows = scores(db_file)
+    d2 = rows[rows["driver_id"] == "D2"]
+    assert sorted(d2["is_current"]) == [0, 1]
+    assert d2.loc[d2["is_current"] == 0, "feature_hash"].item() == before.loc["D2", "feature_hash"]
+    after = current(db_file)
+    assert after.loc["D2", "predicted_risk_score"] == pytest.approx(1.5)
+    pd.testing.assert_frame_equal(after.drop(index="D2"), before.drop(index="D2"))
+
+def test_model_change_retires_old_scores(store, tmp_path):
+    db_file, model_path = store
+    score_store.refresh_driver_scores(db_file, model_path, predict=CountingModel().predict)
+    old_version = score_store.model_version(model_path)
+    new_model_path = tmp_path / "model_b.pkl"
+    new_model_path.write_bytes(b"model b")
+
+    assert score_store.refresh_driver_scores(db_file, str(new_model_path), predict=CountingModel(offset=1.0).predict) == 3
+    rows = scores(db_file)
+    assert (rows.loc[rows["model_version"] == old_version, "is_current"] == 0).all()
+    after = current(db_file)
+    assert (after["model_version"] == score_store.model_version(str(new_model_path))).all()
+    assert after.loc["D1", "predicted_risk_score"] == pytest.approx(2.2)
+
+def test_model_path_resolves_outside_working_directory(tmp_path, monkeypatch):
+    model_dir = tmp_path / "models"
+    model_dir.mkdir()
+    (model_dir / score_store.MODEL_PATH).write_bytes(b"model")
+    monkeypatch.setattr(score_store, "MODEL_DIRS", [str(model_dir)])
+    monkeypatch.chdir(tmp_path)
+    assert score_store.resolve_model_path() == str(model_dir / score_store.MODEL_PATH)